@@ -1,16 +1,34 @@
 from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
 from flask_bcrypt import Bcrypt
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from functools import wraps
+from functools import wraps, lru_cache
 import os
 import pytz
 from models import db, User, Complaint, Issue, Repair, Replacement, Company, Role, Unit, AccountType, IssueItem, BookingForm, CalendarSource, Contact
-from models import Category, ReportedBy, Priority, Status, Type, ExpenseData
-from datetime import datetime, timedelta
+from models import Category, ReportedBy, Priority, Status, Type, ExpenseData, UnitNight, cleaner_units
+from models import MAX_AMOUNT, amount_in_range
+from datetime import datetime, timedelta, date
+from decimal import Decimal, InvalidOperation, ROUND_DOWN
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from sqlalchemy import func, case, and_, or_, insert, update, delete, select, literal, union_all, Date, event
+from sqlalchemy import cast, null, String
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import joinedload
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
+import threading
+import time
+import base64
+import click
+import csv
+import io
+import hashlib
+import json
+import re
 import requests
-from icalendar import Calendar
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
@@ -45,9 +63,54 @@ def malaysia_time_filter(utc_dt):
     return malaysia_time.strftime('%b %d, %Y, %I:%M %p')
 
 
+# Per-worker cache of logged-in users: user_id -> (expires_at, User). The cached
+# users are detached copies with role, company and account types loaded; entries
+# live USER_CACHE_TTL seconds and are dropped as soon as a user, role, company
+# or account type is updated or deleted.
+USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))
+USER_CACHE = {}
+
+
+def load_user_identity(user_id):
+    """User with role, company and account types from one joined query, detached from the request session"""
+    session = db.session.session_factory()
+    try:
+        return session.query(User).options(
+            joinedload(User.role),
+            joinedload(User.account_type),
+            joinedload(User.company).joinedload(Company.account_type)
+        ).filter(User.id == user_id).first()
+    finally:
+        session.close()
+
+
+def clear_user_cache(mapper, connection, target):
+    if isinstance(target, User):
+        USER_CACHE.pop(target.id, None)
+    else:
+        USER_CACHE.clear()
+
+
+for identity_model in (User, Role, Company, AccountType):
+    for event_name in ('after_update', 'after_delete'):
+        event.listen(identity_model, event_name, clear_user_cache)
+
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    now = time.monotonic()
+    cached = USER_CACHE.get(user_id)
+    if cached is None or cached[0] < now:
+        user = load_user_identity(user_id)
+        if user is None:
+            return None
+        cached = (now + USER_CACHE_TTL, user)
+        USER_CACHE[user_id] = cached
+
+    # Copy the cached user and its loaded relationships into this request's
+    # session without querying; anything else still lazy loads as usual
+    return db.session.merge(cached[1], load=False)
 
 
 # Permission-based decorators
@@ -110,24 +173,155 @@ def replacements_manage_required(f):
     return permission_required('can_manage_replacements')(f)
 
 
-def check_unit_availability(unit_id, check_in_date, check_out_date, exclude_booking_id=None):
+def find_unit_conflicts(unit_ids, date_ranges, exclude_booking_id=None):
     """
-    Check if a unit is available for the given date range
-    Returns True if available, False if there's a conflict
+    Find bookings that overlap any of the given [check_in, check_out) ranges
+    for any of the given units, using a single indexed query.
+    Returns a dict mapping (unit_id, range_index) to the list of conflicting
+    bookings; pairs without conflicts are absent.
     """
-    # Query for overlapping bookings
-    query = BookingForm.query.filter(
-        BookingForm.unit_id == unit_id,
-        BookingForm.check_in_date < check_out_date,
-        BookingForm.check_out_date > check_in_date
+    unit_ids = list(unit_ids)
+    date_ranges = list(date_ranges)
+    if not unit_ids or not date_ranges:
+        return {}
+
+    # Overlap test for each requested range, plus an outer bound that lets the
+    # (unit_id, check_in_date, check_out_date) index narrow the scan
+    overlaps = [and_(BookingForm.check_in_date < check_out, BookingForm.check_out_date > check_in)
+                for check_in, check_out in date_ranges]
+    query = db.session.query(
+        BookingForm.id,
+        BookingForm.unit_id,
+        BookingForm.check_in_date,
+        BookingForm.check_out_date,
+        BookingForm.guest_name
+    ).filter(
+        BookingForm.unit_id.in_(unit_ids),
+        BookingForm.check_in_date < max(check_out for _, check_out in date_ranges),
+        BookingForm.check_out_date > min(check_in for check_in, _ in date_ranges),
+        or_(*overlaps)
     )
 
     # Exclude the current booking if we're updating
     if exclude_booking_id:
         query = query.filter(BookingForm.id != exclude_booking_id)
 
-    # If any booking exists in this range, the unit is not available
-    return query.count() == 0
+    conflicts = {}
+    for booking in query.order_by(BookingForm.check_in_date):
+        for index, (check_in, check_out) in enumerate(date_ranges):
+            if booking.check_in_date < check_out and booking.check_out_date > check_in:
+                conflicts.setdefault((booking.unit_id, index), []).append(booking)
+
+    return conflicts
+
+
+def get_booking_conflicts(unit_id, check_in_date, check_out_date, exclude_booking_id=None):
+    """Return the bookings of a unit that overlap the given date range"""
+    conflicts = find_unit_conflicts([unit_id], [(check_in_date, check_out_date)], exclude_booking_id)
+    return [booking for bookings in conflicts.values() for booking in bookings]
+
+
+def check_unit_availability(unit_id, check_in_date, check_out_date, exclude_booking_id=None):
+    """
+    Check if a unit is available for the given date range
+    Returns True if available, False if there's a conflict
+    """
+    return not get_booking_conflicts(unit_id, check_in_date, check_out_date, exclude_booking_id)
+
+
+# Bookings handled per statement when (re)building the unit_night ledger
+UNIT_NIGHT_BATCH_SIZE = 500
+
+
+def unit_night_rows(booking):
+    """
+    unit_night ledger rows of a booking: one per night, the price split evenly
+    over the nights (to 4 decimals) with the rounding remainder on the last night
+    """
+    nights = (booking.check_out_date - booking.check_in_date).days
+    if nights <= 0:
+        return []
+    price = Decimal(str(booking.price or 0))
+    rate = (price / nights).quantize(Decimal('0.0001'), rounding=ROUND_DOWN)
+    rows = [{
+        'booking_id': booking.id,
+        'unit_id': booking.unit_id,
+        'company_id': booking.company_id,
+        'night': booking.check_in_date + timedelta(days=index),
+        'revenue': rate
+    } for index in range(nights)]
+    rows[-1]['revenue'] = price - rate * (nights - 1)
+    return rows
+
+
+def clear_unit_nights(booking_ids):
+    """Remove the unit_night ledger rows of these bookings (call before deleting them)"""
+    booking_ids = sorted(set(booking_ids))
+    for offset in range(0, len(booking_ids), UNIT_NIGHT_BATCH_SIZE):
+        batch = booking_ids[offset:offset + UNIT_NIGHT_BATCH_SIZE]
+        db.session.execute(
+            delete(UnitNight).where(UnitNight.booking_id.in_(batch)).execution_options(synchronize_session=False)
+        )
+
+
+def refresh_unit_nights(booking_ids):
+    """
+    Rewrite the unit_night ledger rows of these bookings from their current
+    dates and prices. Runs in the caller's transaction, so call it after the
+    bookings are written (flushed) and before the commit.
+    """
+    booking_ids = sorted(set(booking_ids))
+    clear_unit_nights(booking_ids)
+    for offset in range(0, len(booking_ids), UNIT_NIGHT_BATCH_SIZE):
+        batch = booking_ids[offset:offset + UNIT_NIGHT_BATCH_SIZE]
+        bookings = db.session.query(
+            BookingForm.id,
+            BookingForm.unit_id,
+            BookingForm.company_id,
+            BookingForm.check_in_date,
+            BookingForm.check_out_date,
+            BookingForm.price
+        ).filter(BookingForm.id.in_(batch))
+
+        rows = [row for booking in bookings for row in unit_night_rows(booking)]
+        if rows:
+            db.session.execute(insert(UnitNight), rows)
+
+
+def rebuild_unit_nights(company_id=None):
+    """
+    Recreate the unit_night ledger from scratch for all bookings, or only those
+    of one company. Commits, and returns the number of bookings processed.
+    """
+    query = delete(UnitNight)
+    if company_id:
+        query = query.where(UnitNight.company_id == company_id)
+    db.session.execute(query.execution_options(synchronize_session=False))
+
+    # Walk the bookings in id order, one batch at a time
+    count = 0
+    last_id = 0
+    while True:
+        bookings = db.session.query(BookingForm.id).filter(BookingForm.id > last_id)
+        if company_id:
+            bookings = bookings.filter(BookingForm.company_id == company_id)
+        batch = [booking_id for (booking_id,) in bookings.order_by(BookingForm.id).limit(UNIT_NIGHT_BATCH_SIZE)]
+        if not batch:
+            break
+        refresh_unit_nights(batch)
+        count += len(batch)
+        last_id = batch[-1]
+
+    db.session.commit()
+    return count
+
+
+@app.cli.command('rebuild-unit-nights')
+@click.option('--company-id', type=int, default=None, help='Only rebuild the bookings of this company')
+def rebuild_unit_nights_command(company_id):
+    """Rebuild the unit_night occupancy ledger from the bookings."""
+    count = rebuild_unit_nights(company_id)
+    print(f"Rebuilt the unit_night ledger for {count} bookings")
 
 
 
@@ -266,6 +460,82 @@ def dashboard():
 
 
 
+# Process-level cache of lookup table {name: id} maps, keyed by model name.
+# Dropped for a table as soon as one of its rows is inserted, updated or deleted.
+LOOKUP_ID_CACHE = {}
+
+
+def lookup_ids(model):
+    """{name: id} of a lookup table such as Status or Type, cached for the process"""
+    ids = LOOKUP_ID_CACHE.get(model.__name__)
+    if ids is None:
+        ids = dict(db.session.query(model.name, model.id))
+        LOOKUP_ID_CACHE[model.__name__] = ids
+    return ids
+
+
+def clear_lookup_ids(mapper, connection, target):
+    LOOKUP_ID_CACHE.pop(mapper.class_.__name__, None)
+
+
+for lookup_model in (Category, ReportedBy, Priority, Status, Type):
+    for event_name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(lookup_model, event_name, clear_lookup_ids)
+
+
+# Relationships each view touches per issue, loaded up front so a listing
+# takes a fixed number of queries instead of a lazy SELECT per row
+ISSUE_LOAD_PRESETS = {
+    'issues': ('category', 'reported_by', 'priority', 'status', 'type', 'issue_item'),
+    'analytics': ('category', 'reported_by', 'priority', 'status', 'type', 'issue_item'),
+    'cleaner_dashboard': ('category', 'priority', 'status', 'issue_item'),
+}
+
+
+def issue_load_options(view):
+    """Query options eager loading the relationships ISSUE_LOAD_PRESETS lists for a view"""
+    return [joinedload(getattr(Issue, relationship)) for relationship in ISSUE_LOAD_PRESETS[view]]
+
+
+# Issue table rows per page on the issues page
+ISSUES_PER_PAGE = 50
+
+
+def get_issue_kpis(company_id):
+    """The issues page KPI cards of a company, from one conditional-aggregate query"""
+    now = datetime.utcnow()
+    status_ids = lookup_ids(Status)
+    priority_ids = lookup_ids(Priority)
+    category_ids = lookup_ids(Category)
+    reported_by_ids = lookup_ids(ReportedBy)
+
+    def count_where(*conditions):
+        return func.sum(case((and_(*conditions), 1), else_=0))
+
+    def is_lookup(column, ids, name):
+        return column == ids[name] if name in ids else literal(False)
+
+    row = db.session.query(
+        count_where(is_lookup(Issue.priority_id, priority_ids, 'High')),
+        count_where(is_lookup(Issue.status_id, status_ids, 'Pending')),
+        count_where(is_lookup(Issue.category_id, category_ids, 'Cleaning Issue'),
+                    Issue.date_added >= now - timedelta(days=7)),
+        count_where(is_lookup(Issue.reported_by_id, reported_by_ids, 'Cleaner'),
+                    Issue.date_added >= now - timedelta(days=1)),
+        func.sum(case((Issue.date_added >= now - timedelta(days=30), Issue.cost), else_=None)),
+        func.count(Issue.id)
+    ).filter(Issue.company_id == company_id).one()
+
+    return {
+        'high_priority': int(row[0] or 0),
+        'pending': int(row[1] or 0),
+        'cleaning_issues_week': int(row[2] or 0),
+        'reported_by_cleaner_today': int(row[3] or 0),
+        'total_cost_month': row[4] or 0,
+        'total_issues': row[5]
+    }
+
+
 # I add (Manually)
 @app.route('/issues')
 @login_required
@@ -274,9 +544,31 @@ def issues():
     # Filter records to only show those belonging to the user's company
     user_company_id = current_user.company_id
     issues = []
+    pagination = None
+    kpis = {'high_priority': 0, 'pending': 0, 'cleaning_issues_week': 0, 'reported_by_cleaner_today': 0,
+            'total_cost_month': 0, 'total_issues': 0}
+    search = request.args.get('q', '').strip()
 
     if current_user.has_permission('can_view_issues'):
-        issues = Issue.query.filter_by(company_id=user_company_id).all()
+        kpis = get_issue_kpis(user_company_id)
+
+        # One page of the issue table, most recent first, optionally searched
+        query = Issue.query.options(*issue_load_options('issues')).filter_by(company_id=user_company_id)
+        if search:
+            pattern = f"%{search}%"
+            query = query.filter(or_(
+                Issue.unit.ilike(pattern),
+                Issue.description.ilike(pattern),
+                Issue.solution.ilike(pattern),
+                Issue.guest_name.ilike(pattern),
+                Issue.assigned_to.ilike(pattern)
+            ))
+        pagination = query.order_by(Issue.date_added.desc(), Issue.id.desc()).paginate(
+            page=request.args.get('page', 1, type=int),
+            per_page=min(request.args.get('per_page', ISSUES_PER_PAGE, type=int), 200),
+            error_out=False
+        )
+        issues = pagination.items
 
     # Get units for this company for the form
     units = Unit.query.filter_by(company_id=user_company_id).all()
@@ -289,24 +581,22 @@ def issues():
     types = Type.query.all()
 
     # Get issue items with their categories
-    issue_items_by_category = {}
-    for category in categories:
-        issue_items_by_category[category.id] = IssueItem.query.filter_by(category_id=category.id).all()
-
-    # Add current date/time for template calculations
-    now = datetime.now()
+    issue_items_by_category = {category.id: [] for category in categories}
+    for item in IssueItem.query.filter(IssueItem.category_id.in_(issue_items_by_category)).order_by(IssueItem.id):
+        issue_items_by_category[item.category_id].append(item)
 
     return render_template('issues.html',
                            issues=issues,
+                           pagination=pagination,
+                           kpis=kpis,
+                           search=search,
                            units=units,
                            categories=categories,
                            reported_by_options=reported_by_options,
                            priorities=priorities,
                            statuses=statuses,
                            types=types,
-                           issue_items_by_category=issue_items_by_category,
-                           now=now,
-                           timedelta=timedelta)
+                           issue_items_by_category=issue_items_by_category)
 
 
 # Update your add_issue route to handle the issue_item field:
@@ -844,49 +1134,157 @@ def logout():
     return redirect(url_for('login'))
 
 
+# Rows per page of the admin list views
+ADMIN_PAGE_SIZE = 50
+
+
+def encode_keyset_cursor(value, row_id):
+    """Opaque keyset pagination cursor for the sort value and id of a row"""
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+    elif isinstance(value, Decimal):
+        value = str(value)
+    payload = json.dumps([value, row_id])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_keyset_cursor(cursor, column):
+    """
+    Decode a cursor produced by encode_keyset_cursor for the given sort column
+    Returns (value, row_id) or None if the cursor is missing or invalid
+    """
+    if not cursor:
+        return None
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        python_type = column.type.python_type
+        if python_type is datetime:
+            value = datetime.fromisoformat(value)
+        elif python_type is date:
+            value = date.fromisoformat(value)
+        elif python_type is Decimal:
+            value = Decimal(value)
+        return value, int(row_id)
+    except (ValueError, TypeError, ArithmeticError):
+        return None
+
+
+def admin_listing(model, options=(), sort_columns=None, search_columns=(), default_sort='id'):
+    """
+    One page of an admin list view, across all companies, with keyset pagination.
+    Reads sort (id or a key of sort_columns, which must be non-nullable), direction,
+    q (searched in search_columns), company_id and the after/before page cursors
+    from the request. Returns a dict with the rows, the next and previous cursors
+    and the current sort and filters for the templates/admin/_listing.html macros.
+    """
+    sort_columns = {'id': model.id, **(sort_columns or {})}
+    sort = request.args.get('sort', default_sort)
+    if sort not in sort_columns:
+        sort = default_sort
+    sort_column = sort_columns[sort]
+    direction = 'asc' if request.args.get('direction') == 'asc' else 'desc'
+    search = request.args.get('q', '').strip()
+    company_id = request.args.get('company_id', type=int)
+
+    query = model.query.options(*options)
+    if search:
+        query = query.filter(or_(*[column.ilike(f"%{search}%") for column in search_columns]))
+    if company_id:
+        query = query.filter(model.company_id == company_id)
+
+    # Rows strictly past the cursor in (sort value, id) order. A before cursor
+    # reads the previous page backwards, which is reversed again below.
+    cursor = decode_keyset_cursor(request.args.get('after'), sort_column)
+    backwards = False
+    if not cursor:
+        cursor = decode_keyset_cursor(request.args.get('before'), sort_column)
+        backwards = cursor is not None
+    ascending = (direction == 'asc') != backwards
+    if cursor:
+        value, row_id = cursor
+        if ascending:
+            query = query.filter(or_(sort_column > value, and_(sort_column == value, model.id > row_id)))
+        else:
+            query = query.filter(or_(sort_column < value, and_(sort_column == value, model.id < row_id)))
+    order = [sort_column, model.id] if sort_column is not model.id else [model.id]
+    query = query.order_by(*[column.asc() if ascending else column.desc() for column in order])
+
+    rows = query.limit(ADMIN_PAGE_SIZE + 1).all()
+    has_more = len(rows) > ADMIN_PAGE_SIZE
+    rows = rows[:ADMIN_PAGE_SIZE]
+    if backwards:
+        rows.reverse()
+
+    def cursor_of(row):
+        return encode_keyset_cursor(getattr(row, sort_column.key), row.id)
+
+    # Past a cursor there are always rows on the side we came from
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_more or backwards:
+            next_cursor = cursor_of(rows[-1])
+        if (has_more and backwards) or (cursor and not backwards):
+            previous_cursor = cursor_of(rows[0])
+
+    search_filters = {key: value for key, value in (('q', search), ('company_id', company_id)) if value}
+    return {
+        'rows': rows,
+        'next': next_cursor,
+        'previous': previous_cursor,
+        'sort': sort,
+        'direction': direction,
+        'search': search,
+        'company_id': company_id,
+        'search_filters': search_filters,
+        'filters': {'sort': sort, 'direction': direction, **search_filters},
+        'companies': db.session.query(Company.id, Company.name).order_by(Company.name).all()
+    }
+
+
 # Admin routes
 @app.route('/admin')
 @login_required
 @admin_required
 def admin_dashboard():
-    users = User.query.all()
-    companies = Company.query.all()
-    roles = Role.query.all()
-    complaints = Complaint.query.all()
-    repairs = Repair.query.all()
-    replacements = Replacement.query.all()
-    units = Unit.query.all()
-    issues = Issue.query.all()
+    # Row counts per company of every entity, from one UNION ALL of grouped counts
+    counted_models = {'users': User, 'complaints': Complaint, 'issues': Issue, 'repairs': Repair,
+                      'replacements': Replacement, 'units': Unit}
+    counts = union_all(*[
+        select(literal(entity).label('entity'), model.company_id, func.count(model.id))
+        .group_by(model.company_id)
+        for entity, model in counted_models.items()
+    ])
+    counts_by_company = {entity: {} for entity in counted_models}
+    for entity, company_id, count in db.session.execute(counts):
+        counts_by_company[entity][company_id] = count
+
+    companies = db.session.query(Company.id, Company.name).order_by(Company.id).all()
+    totals = {entity: sum(company_counts.values()) for entity, company_counts in counts_by_company.items()}
+    totals['companies'] = len(companies)
+    totals['roles'] = db.session.query(func.count(Role.id)).scalar()
 
-    # Get count of each type by company
     company_stats = []
-    for company in companies:
-        company_users = User.query.filter_by(company_id=company.id).count()
-        company_complaints = Complaint.query.filter_by(company_id=company.id).count()
-        company_issues = Issue.query.filter_by(company_id=company.id).count()
-        company_repairs = Repair.query.filter_by(company_id=company.id).count()
-        company_replacements = Replacement.query.filter_by(company_id=company.id).count()
-        company_units = Unit.query.filter_by(company_id=company.id).count()
-
+    for company_id, name in companies:
         company_stats.append({
-            'name': company.name,
-            'users': company_users,
-            'complaints': company_complaints,
-            'issues': company_issues,
-            'repairs': company_repairs,
-            'replacements': company_replacements,
-            'units': company_units
+            'name': name,
+            **{entity: counts_by_company[entity].get(company_id, 0) for entity in counted_models}
         })
 
+    # Latest rows for the tables, with the company and author they show
+    users = User.query.options(joinedload(User.company), joinedload(User.role)).order_by(User.id.desc()).limit(5).all()
+    complaints = Complaint.query.options(joinedload(Complaint.company), joinedload(Complaint.author)).order_by(
+        Complaint.date_added.desc()).limit(5).all()
+    repairs = Repair.query.options(joinedload(Repair.company), joinedload(Repair.author)).order_by(
+        Repair.created_at.desc()).limit(5).all()
+    replacements = Replacement.query.options(joinedload(Replacement.company), joinedload(Replacement.author)).order_by(
+        Replacement.date_requested.desc()).limit(5).all()
+
     return render_template('admin/dashboard.html',
+                           totals=totals,
                            users=users,
-                           companies=companies,
-                           roles=roles,
                            complaints=complaints,
-                           issues=issues,
                            repairs=repairs,
                            replacements=replacements,
-                           units=units,
                            company_stats=company_stats)
 
 
@@ -895,8 +1293,13 @@ def admin_dashboard():
 @login_required
 @admin_required
 def admin_units():
-    units = Unit.query.all()
-    return render_template('admin/units.html', units=units)
+    listing = admin_listing(
+        Unit,
+        options=[joinedload(Unit.company)],
+        sort_columns={'unit_number': Unit.unit_number},
+        search_columns=[Unit.unit_number, Unit.building, Unit.description]
+    )
+    return render_template('admin/units.html', units=listing['rows'], listing=listing)
 
 
 # Modify the add_unit route in app.py to handle the address field
@@ -1085,8 +1488,13 @@ def unit_info(id):
 @login_required
 @admin_required
 def admin_users():
-    users = User.query.all()
-    return render_template('admin/users.html', users=users)
+    listing = admin_listing(
+        User,
+        options=[joinedload(User.company), joinedload(User.role)],
+        sort_columns={'name': User.name, 'email': User.email},
+        search_columns=[User.name, User.email]
+    )
+    return render_template('admin/users.html', users=listing['rows'], listing=listing)
 
 
 @app.route('/admin/add_user', methods=['GET', 'POST'])
@@ -1341,24 +1749,42 @@ def admin_delete_role(id):
 @login_required
 @admin_required
 def admin_complaints():
-    complaints = Complaint.query.all()
-    return render_template('admin/complaints.html', complaints=complaints)
+    listing = admin_listing(
+        Complaint,
+        options=[joinedload(Complaint.company), joinedload(Complaint.author)],
+        sort_columns={'item': Complaint.item, 'unit': Complaint.unit, 'date': Complaint.date_added},
+        search_columns=[Complaint.item, Complaint.remark, Complaint.unit],
+        default_sort='date'
+    )
+    return render_template('admin/complaints.html', complaints=listing['rows'], listing=listing)
 
 
 @app.route('/admin/repairs')
 @login_required
 @admin_required
 def admin_repairs():
-    repairs = Repair.query.all()
-    return render_template('admin/repairs.html', repairs=repairs)
+    listing = admin_listing(
+        Repair,
+        options=[joinedload(Repair.company), joinedload(Repair.author)],
+        sort_columns={'item': Repair.item, 'unit': Repair.unit, 'date': Repair.created_at},
+        search_columns=[Repair.item, Repair.remark, Repair.unit],
+        default_sort='date'
+    )
+    return render_template('admin/repairs.html', repairs=listing['rows'], listing=listing)
 
 
 @app.route('/admin/replacements')
 @login_required
 @admin_required
 def admin_replacements():
-    replacements = Replacement.query.all()
-    return render_template('admin/replacements.html', replacements=replacements)
+    listing = admin_listing(
+        Replacement,
+        options=[joinedload(Replacement.company), joinedload(Replacement.author)],
+        sort_columns={'item': Replacement.item, 'unit': Replacement.unit, 'date': Replacement.date_requested},
+        search_columns=[Replacement.item, Replacement.remark, Replacement.unit],
+        default_sort='date'
+    )
+    return render_template('admin/replacements.html', replacements=listing['rows'], listing=listing)
 
 
 # Function to create default roles and a default company
@@ -1696,79 +2122,90 @@ def create_issue_defaults():
     print("Issue defaults created")
 
 
+def booking_stat_conditions(today, tomorrow):
+    """SQL conditions behind each booking stat card, keyed by filter type"""
+    occupied = and_(BookingForm.check_in_date <= today, BookingForm.check_out_date > today)
+
+    return {
+        'occupancy_current': occupied,
+        'check_ins_today': BookingForm.check_in_date == today,
+        'revenue_today': BookingForm.check_in_date == today,
+        'currently_staying': occupied,
+        'check_ins_tomorrow': BookingForm.check_in_date == tomorrow,
+        'check_outs_today': BookingForm.check_out_date == today,
+        'check_outs_tomorrow': BookingForm.check_out_date == tomorrow
+    }
+
+
+def get_booking_stats(company_id, today=None):
+    """
+    Compute the booking stat cards for a company in a single aggregate query.
+    Returns the stats dictionary used by bookings.html
+    """
+    today = today or datetime.now().date()
+    tomorrow = today + timedelta(days=1)
+    conditions = booking_stat_conditions(today, tomorrow)
+
+    def count_where(condition):
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+    unit_total = db.session.query(func.count(Unit.id)).filter(
+        Unit.company_id == company_id
+    ).scalar_subquery()
+
+    # Every stat card only concerns bookings touching today or tomorrow, so
+    # restrict the scan to that window and aggregate everything in one pass
+    row = db.session.query(
+        unit_total,
+        count_where(conditions['occupancy_current']),
+        count_where(conditions['check_ins_today']),
+        count_where(conditions['check_ins_tomorrow']),
+        count_where(conditions['check_outs_today']),
+        count_where(conditions['check_outs_tomorrow']),
+        func.coalesce(func.sum(case((conditions['revenue_today'], BookingForm.price), else_=0)), 0)
+    ).select_from(BookingForm).filter(
+        BookingForm.company_id == company_id,
+        BookingForm.check_in_date <= tomorrow,
+        BookingForm.check_out_date >= today
+    ).one()
+
+    (unit_total, occupancy_current, check_ins_today, check_ins_tomorrow,
+     check_outs_today, check_outs_tomorrow, revenue_today) = row
+
+    return {
+        'unit_total': unit_total or 0,
+        'occupancy_current': occupancy_current,
+        'check_ins_today': check_ins_today,
+        'revenue_today': '{:,.2f}'.format(float(revenue_today)),
+        'currently_staying': occupancy_current,
+        'check_ins_tomorrow': check_ins_tomorrow,
+        'check_outs_today': check_outs_today,
+        'check_outs_tomorrow': check_outs_tomorrow
+    }
+
+
 @app.route('/bookings')
 @login_required
 @permission_required('can_view_bookings')
 def bookings():
     # Filter records to only show those belonging to the user's company
     user_company_id = current_user.company_id
-    bookings_list = BookingForm.query.filter_by(company_id=user_company_id).order_by(
-        BookingForm.date_added.desc()).all()
+
+    # In paged view the table is filled page by page from /api/bookings
+    paged = request.args.get('view') == 'paged'
+    bookings_list = []
+    if not paged:
+        bookings_list = BookingForm.query.options(joinedload(BookingForm.unit)).filter_by(
+            company_id=user_company_id).order_by(BookingForm.date_added.desc()).all()
 
     # Get units for this company for the form
     units = Unit.query.filter_by(company_id=user_company_id).all()
 
     # Calculate analytics for the dashboard
-    today = datetime.now().date()
-    tomorrow = today + timedelta(days=1)  # Get tomorrow's date
-
-    # Calculate total units
-    unit_total = Unit.query.filter_by(company_id=user_company_id).count()
-
-    # Calculate occupancy today (units where check-in <= today < check-out)
-    occupancy_current = BookingForm.query.filter(
-        BookingForm.company_id == user_company_id,
-        BookingForm.check_in_date <= today,
-        BookingForm.check_out_date > today
-    ).count()
-
-    # Calculate check-ins today
-    check_ins_today = BookingForm.query.filter(
-        BookingForm.company_id == user_company_id,
-        BookingForm.check_in_date == today
-    ).count()
-
-    # Calculate revenue today (total price of bookings with check-in today)
-    today_check_ins = BookingForm.query.filter(
-        BookingForm.company_id == user_company_id,
-        BookingForm.check_in_date == today
-    ).all()
-    revenue_today = sum(float(booking.price) for booking in today_check_ins if booking.price)
-
-    # Currently staying (check-in <= today < check-out)
-    currently_staying = occupancy_current
-
-    # Calculate check-ins tomorrow (NEW)
-    check_ins_tomorrow = BookingForm.query.filter(
-        BookingForm.company_id == user_company_id,
-        BookingForm.check_in_date == tomorrow
-    ).count()
-
-    # Calculate check-outs today (NEW)
-    check_outs_today = BookingForm.query.filter(
-        BookingForm.company_id == user_company_id,
-        BookingForm.check_out_date == today
-    ).count()
-
-    # Calculate check-outs tomorrow (NEW)
-    check_outs_tomorrow = BookingForm.query.filter(
-        BookingForm.company_id == user_company_id,
-        BookingForm.check_out_date == tomorrow
-    ).count()
-
-    # Create stats dictionary
-    stats = {
-        'unit_total': unit_total,
-        'occupancy_current': occupancy_current,
-        'check_ins_today': check_ins_today,
-        'revenue_today': '{:,.2f}'.format(revenue_today),
-        'currently_staying': currently_staying,
-        'check_ins_tomorrow': check_ins_tomorrow,  # New stat
-        'check_outs_today': check_outs_today,  # New stat
-        'check_outs_tomorrow': check_outs_tomorrow
-    }
+    stats = get_booking_stats(user_company_id)
 
-    return render_template('bookings.html', bookings=bookings_list, units=units, stats=stats, active_filter=None)
+    return render_template('bookings.html', bookings=bookings_list, units=units, stats=stats, active_filter=None,
+                           paged=paged)
 
 
 @app.route('/add_booking', methods=['GET', 'POST'])
@@ -1853,6 +2290,8 @@ def add_booking():
         )
 
         db.session.add(new_booking)
+        db.session.flush()
+        refresh_unit_nights([new_booking.id])
         db.session.commit()
 
         # Set session variable with the new booking ID
@@ -1936,6 +2375,8 @@ def update_booking(id):
     infants = request.form.get('infants', '')
     booking.infants = int(infants) if infants.strip() else None
 
+    db.session.flush()
+    refresh_unit_nights([id])
     db.session.commit()
     session['highlight_booking_id'] = id
     flash('Booking updated successfully', 'success')
@@ -1986,6 +2427,7 @@ def delete_booking(id):
         flash('You are not authorized to delete this booking', 'danger')
         return redirect(url_for('bookings'))
 
+    clear_unit_nights([booking.id])
     db.session.delete(booking)
     db.session.commit()
 
@@ -2003,115 +2445,148 @@ def bookings_filter(filter_type):
     # Get units for this company for the form
     units = Unit.query.filter_by(company_id=user_company_id).all()
 
-    # Calculate analytics for the dashboard
+    # Calculate analytics for the dashboard (same as in regular bookings route)
     today = datetime.now().date()
     tomorrow = today + timedelta(days=1)
-
-    # Calculate all the stats (same as in regular bookings route)
-    unit_total = Unit.query.filter_by(company_id=user_company_id).count()
-
-    occupancy_current = BookingForm.query.filter(
-        BookingForm.company_id == user_company_id,
-        BookingForm.check_in_date <= today,
-        BookingForm.check_out_date > today
-    ).count()
-
-    check_ins_today = BookingForm.query.filter(
-        BookingForm.company_id == user_company_id,
-        BookingForm.check_in_date == today
-    ).count()
-
-    today_check_ins = BookingForm.query.filter(
-        BookingForm.company_id == user_company_id,
-        BookingForm.check_in_date == today
-    ).all()
-    revenue_today = sum(float(booking.price) for booking in today_check_ins if booking.price)
-
-    currently_staying = occupancy_current
-
-    check_ins_tomorrow = BookingForm.query.filter(
-        BookingForm.company_id == user_company_id,
-        BookingForm.check_in_date == tomorrow
-    ).count()
-
-    check_outs_today = BookingForm.query.filter(
-        BookingForm.company_id == user_company_id,
-        BookingForm.check_out_date == today
-    ).count()
-
-    check_outs_tomorrow = BookingForm.query.filter(
-        BookingForm.company_id == user_company_id,
-        BookingForm.check_out_date == tomorrow
-    ).count()
+    stats = get_booking_stats(user_company_id, today)
+
+    filter_messages = {
+        'occupancy_current': "Showing currently occupied units",
+        'check_ins_today': f"Showing check-ins for today ({today.strftime('%b %d, %Y')})",
+        'revenue_today': f"Showing revenue for today ({today.strftime('%b %d, %Y')})",
+        'currently_staying': "Showing currently staying guests",
+        'check_ins_tomorrow': f"Showing check-ins for tomorrow ({tomorrow.strftime('%b %d, %Y')})",
+        'check_outs_today': f"Showing check-outs for today ({today.strftime('%b %d, %Y')})",
+        'check_outs_tomorrow': f"Showing check-outs for tomorrow ({tomorrow.strftime('%b %d, %Y')})"
+    }
 
     # Apply specific filter based on filter_type
-    if filter_type == 'occupancy_current':
-        bookings_list = BookingForm.query.filter(
-            BookingForm.company_id == user_company_id,
-            BookingForm.check_in_date <= today,
-            BookingForm.check_out_date > today
-        ).all()
-        filter_message = "Showing currently occupied units"
-    elif filter_type == 'check_ins_today':
-        bookings_list = BookingForm.query.filter(
-            BookingForm.company_id == user_company_id,
-            BookingForm.check_in_date == today
-        ).all()
-        filter_message = f"Showing check-ins for today ({today.strftime('%b %d, %Y')})"
-    elif filter_type == 'revenue_today':
-        bookings_list = BookingForm.query.filter(
-            BookingForm.company_id == user_company_id,
-            BookingForm.check_in_date == today
-        ).all()
-        filter_message = f"Showing revenue for today ({today.strftime('%b %d, %Y')})"
-    elif filter_type == 'currently_staying':
-        bookings_list = BookingForm.query.filter(
-            BookingForm.company_id == user_company_id,
-            BookingForm.check_in_date <= today,
-            BookingForm.check_out_date > today
-        ).all()
-        filter_message = "Showing currently staying guests"
-    elif filter_type == 'check_ins_tomorrow':
-        bookings_list = BookingForm.query.filter(
-            BookingForm.company_id == user_company_id,
-            BookingForm.check_in_date == tomorrow
-        ).all()
-        filter_message = f"Showing check-ins for tomorrow ({tomorrow.strftime('%b %d, %Y')})"
-    elif filter_type == 'check_outs_today':
-        bookings_list = BookingForm.query.filter(
-            BookingForm.company_id == user_company_id,
-            BookingForm.check_out_date == today
-        ).all()
-        filter_message = f"Showing check-outs for today ({today.strftime('%b %d, %Y')})"
-    elif filter_type == 'check_outs_tomorrow':
-        bookings_list = BookingForm.query.filter(
-            BookingForm.company_id == user_company_id,
-            BookingForm.check_out_date == tomorrow
-        ).all()
-        filter_message = f"Showing check-outs for tomorrow ({tomorrow.strftime('%b %d, %Y')})"
+    query = BookingForm.query.options(joinedload(BookingForm.unit)).filter(
+        BookingForm.company_id == user_company_id)
+    condition = booking_stat_conditions(today, tomorrow).get(filter_type)
+    if condition is not None:
+        query = query.filter(condition)
+        filter_message = filter_messages[filter_type]
     else:
         # Default - show all bookings
-        bookings_list = BookingForm.query.filter_by(company_id=user_company_id).all()
         filter_message = None
 
-    # Create stats dictionary
-    stats = {
-        'unit_total': unit_total,
-        'occupancy_current': occupancy_current,
-        'check_ins_today': check_ins_today,
-        'revenue_today': '{:,.2f}'.format(revenue_today),
-        'currently_staying': currently_staying,
-        'check_ins_tomorrow': check_ins_tomorrow,
-        'check_outs_today': check_outs_today,
-        'check_outs_tomorrow': check_outs_tomorrow
-    }
+    # In paged view the table is filled page by page from /api/bookings
+    paged = request.args.get('view') == 'paged'
+    bookings_list = [] if paged else query.all()
 
     return render_template('bookings.html',
                            bookings=bookings_list,
                            units=units,
                            stats=stats,
                            filter_message=filter_message,
-                           active_filter=filter_type)  # Pass the active filter to highlight the current selection
+                           active_filter=filter_type,  # Pass the active filter to highlight the current selection
+                           paged=paged)
+
+
+# Columns the bookings list can be sorted by. All are non-nullable so they can
+# be combined with the booking id into a stable keyset cursor.
+BOOKING_SORT_COLUMNS = {
+    'date_added': BookingForm.date_added,
+    'check_in_date': BookingForm.check_in_date,
+    'check_out_date': BookingForm.check_out_date,
+    'guest_name': BookingForm.guest_name,
+    'price': BookingForm.price
+}
+
+
+@app.route('/api/bookings')
+@login_required
+@permission_required('can_view_bookings')
+def get_bookings_page():
+    """
+    Paginated bookings list for the current company.
+    Query parameters: sort, order (asc/desc), q (guest name or confirmation code),
+    filter (a stat card filter type), limit and cursor (from the previous page)
+    """
+    company_id = current_user.company_id
+
+    sort = request.args.get('sort', 'date_added')
+    if sort not in BOOKING_SORT_COLUMNS:
+        return jsonify({'error': f'Invalid sort column: {sort}'}), 400
+    sort_column = BOOKING_SORT_COLUMNS[sort]
+    descending = request.args.get('order', 'desc') != 'asc'
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+
+    query = BookingForm.query.options(joinedload(BookingForm.unit)).filter(BookingForm.company_id == company_id)
+
+    # Restrict to one of the stat card filters if requested
+    filter_type = request.args.get('filter')
+    if filter_type:
+        today = datetime.now().date()
+        condition = booking_stat_conditions(today, today + timedelta(days=1)).get(filter_type)
+        if condition is not None:
+            query = query.filter(condition)
+
+    # Text search on guest name and confirmation code
+    search = request.args.get('q', '').strip().lower()
+    if search:
+        query = query.filter(or_(
+            func.lower(BookingForm.guest_name).contains(search, autoescape=True),
+            func.lower(BookingForm.confirmation_code).contains(search, autoescape=True)
+        ))
+
+    # Continue after the last row of the previous page
+    cursor = request.args.get('cursor')
+    if cursor:
+        decoded = decode_keyset_cursor(cursor, sort_column)
+        if decoded is None:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        last_value, last_id = decoded
+        if descending:
+            query = query.filter(or_(sort_column < last_value,
+                                     and_(sort_column == last_value, BookingForm.id < last_id)))
+        else:
+            query = query.filter(or_(sort_column > last_value,
+                                     and_(sort_column == last_value, BookingForm.id > last_id)))
+
+    if descending:
+        query = query.order_by(sort_column.desc(), BookingForm.id.desc())
+    else:
+        query = query.order_by(sort_column.asc(), BookingForm.id.asc())
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_keyset_cursor(getattr(last, sort), last.id)
+
+    bookings_data = []
+    for booking in rows:
+        bookings_data.append({
+            'id': booking.id,
+            'guest_name': booking.guest_name,
+            'contact_number': booking.contact_number,
+            'unit_id': booking.unit_id,
+            'unit_number': booking.unit.unit_number if booking.unit else None,
+            'check_in_date': booking.check_in_date.isoformat(),
+            'check_out_date': booking.check_out_date.isoformat(),
+            'number_of_nights': booking.number_of_nights,
+            'number_of_guests': booking.number_of_guests,
+            'confirmation_code': booking.confirmation_code,
+            'adults': booking.adults,
+            'children': booking.children,
+            'infants': booking.infants,
+            'booking_date': booking.booking_date.isoformat() if booking.booking_date else None,
+            'price': str(booking.price),
+            'booking_source': booking.booking_source,
+            'payment_status': booking.payment_status
+        })
+
+    return jsonify({
+        'bookings': bookings_data,
+        'next_cursor': next_cursor,
+        'has_more': has_more
+    })
 
 
 @app.route('/api/unit_bookings/<int:unit_id>')
@@ -2167,30 +2642,16 @@ def check_availability():
                 'error': 'Check-out date must be after check-in date'
             })
 
-        # Check availability
-        is_available = check_unit_availability(unit_id, check_in_date, check_out_date, booking_id)
-
-        # If not available, find the conflicting bookings
+        # Find conflicting bookings; the unit is available if there are none
         conflicting_bookings = []
-        if not is_available:
-            conflicts = BookingForm.query.filter(
-                BookingForm.unit_id == unit_id,
-                BookingForm.check_in_date < check_out_date,
-                BookingForm.check_out_date > check_in_date
-            )
-
-            # Exclude the current booking if we're updating
-            if booking_id:
-                conflicts = conflicts.filter(BookingForm.id != booking_id)
-
-            # Format the conflicts
-            for booking in conflicts:
-                conflicting_bookings.append({
-                    'id': booking.id,
-                    'check_in_date': booking.check_in_date.isoformat(),
-                    'check_out_date': booking.check_out_date.isoformat(),
-                    'guest_name': booking.guest_name
-                })
+        for booking in get_booking_conflicts(unit_id, check_in_date, check_out_date, booking_id):
+            conflicting_bookings.append({
+                'id': booking.id,
+                'check_in_date': booking.check_in_date.isoformat(),
+                'check_out_date': booking.check_out_date.isoformat(),
+                'guest_name': booking.guest_name
+            })
+        is_available = not conflicting_bookings
 
         return jsonify({
             'available': is_available,
@@ -2202,6 +2663,89 @@ def check_availability():
     except Exception as e:
         return jsonify({'available': False, 'error': str(e)})
 
+
+# Largest batch availability request: date ranges and requested unit ids
+AVAILABILITY_BATCH_MAX_RANGES = 50
+AVAILABILITY_BATCH_MAX_UNITS = 500
+
+
+@app.route('/api/check_availability/batch', methods=['POST'])
+@login_required
+def check_availability_batch():
+    """
+    Check many units against many date ranges at once.
+    Expects JSON: {"ranges": [{"check_in": "YYYY-MM-DD", "check_out": "YYYY-MM-DD"}, ...],
+                   "unit_ids": [...]}  (unit_ids is optional, all company units when missing)
+    Returns, for each range, the available unit ids and the conflicts per unavailable unit.
+    """
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    company_id = current_user.company_id
+
+    ranges = data.get('ranges', [])
+    if not isinstance(ranges, list):
+        return jsonify({'error': 'ranges must be a list'}), 400
+    if len(ranges) > AVAILABILITY_BATCH_MAX_RANGES:
+        return jsonify({'error': f'At most {AVAILABILITY_BATCH_MAX_RANGES} ranges per request'}), 400
+
+    try:
+        date_ranges = []
+        for date_range in ranges:
+            check_in_date = datetime.strptime(date_range['check_in'], '%Y-%m-%d').date()
+            check_out_date = datetime.strptime(date_range['check_out'], '%Y-%m-%d').date()
+            if check_out_date <= check_in_date:
+                return jsonify({'error': 'Check-out date must be after check-in date'}), 400
+            date_ranges.append((check_in_date, check_out_date))
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'Each range needs check_in and check_out dates in YYYY-MM-DD format'}), 400
+
+    if not date_ranges:
+        return jsonify({'error': 'At least one date range is required'}), 400
+
+    # Only consider units that belong to the user's company
+    units_query = db.session.query(Unit.id).filter(Unit.company_id == company_id)
+    # Only a missing unit_ids means all units; an empty list checks none
+    if 'unit_ids' in data:
+        requested_unit_ids = data['unit_ids']
+        if not isinstance(requested_unit_ids, list):
+            return jsonify({'error': 'unit_ids must be a list of integers'}), 400
+        if len(requested_unit_ids) > AVAILABILITY_BATCH_MAX_UNITS:
+            return jsonify({'error': f'At most {AVAILABILITY_BATCH_MAX_UNITS} unit_ids per request'}), 400
+        try:
+            requested_unit_ids = [int(unit_id) for unit_id in requested_unit_ids]
+        except (TypeError, ValueError):
+            return jsonify({'error': 'unit_ids must be a list of integers'}), 400
+        units_query = units_query.filter(Unit.id.in_(requested_unit_ids))
+    unit_ids = [unit_id for unit_id, in units_query.order_by(Unit.id)]
+
+    conflicts = find_unit_conflicts(unit_ids, date_ranges)
+
+    results = []
+    for index, (check_in_date, check_out_date) in enumerate(date_ranges):
+        range_conflicts = {}
+        for unit_id in unit_ids:
+            bookings = conflicts.get((unit_id, index))
+            if bookings:
+                range_conflicts[unit_id] = [{
+                    'id': booking.id,
+                    'check_in_date': booking.check_in_date.isoformat(),
+                    'check_out_date': booking.check_out_date.isoformat(),
+                    'guest_name': booking.guest_name
+                } for booking in bookings]
+
+        results.append({
+            'check_in_date': check_in_date.isoformat(),
+            'check_out_date': check_out_date.isoformat(),
+            'available_unit_ids': [unit_id for unit_id in unit_ids if unit_id not in range_conflicts],
+            'conflicts': range_conflicts
+        })
+
+    return jsonify({'ranges': results})
+
+
 # Route for managers to view cleaners
 @app.route('/manage_cleaners')
 @login_required
@@ -2274,124 +2818,199 @@ def cleaner_dashboard():
     # Get assigned units
     assigned_units = current_user.assigned_units
 
-    # Get issues related to those units
+    # Get issues related to those units, most recent first
     issues = []
-    for unit in assigned_units:
-        unit_issues = Issue.query.filter_by(unit_id=unit.id).all()
-        issues.extend(unit_issues)
-
-    # Sort issues by date, most recent first
-    issues.sort(key=lambda x: x.date_added, reverse=True)
+    if assigned_units:
+        issues = Issue.query.options(*issue_load_options('cleaner_dashboard')).filter(
+            Issue.unit_id.in_([unit.id for unit in assigned_units])
+        ).order_by(Issue.date_added.desc()).all()
 
     return render_template('cleaner_dashboard.html', units=assigned_units, issues=issues)
 
 
 # Add these routes to app.py
 
+# Longest date range a cleaning plan covers
+CLEANING_PLAN_MAX_DAYS = 31
+
+
+def cleaning_supplies(unit, checkin_booking):
+    """Towels, rubbish bags and toilet rolls to prepare when cleaning a unit after a check-out"""
+    if checkin_booking:
+        return {
+            'towels': checkin_booking.number_of_guests,
+            'rubbish_bags': checkin_booking.number_of_nights,
+            'toilet_rolls': checkin_booking.number_of_nights * (unit.toilet_count or 1)
+        }
+    return {
+        'towels': unit.towel_count or 2,
+        'rubbish_bags': 2,
+        'toilet_rolls': 2 * (unit.toilet_count or 1)
+    }
+
+
+def build_cleaning_plan(company_id, start_date, end_date, cleaner_id=None):
+    """
+    Cleaning plan of a company for the check-outs from start_date to end_date
+    (inclusive): one entry per check-out with its unit, the check-in on the same
+    unit that day if any, and the supplies to prepare, grouped under each cleaner
+    assigned to the unit. cleaner_id limits the plan to one cleaner.
+    Returns [{'cleaner': User, 'checkouts': [entry, ...]}] for cleaners with work.
+    """
+    checkouts = BookingForm.query.options(joinedload(BookingForm.unit)).filter(
+        BookingForm.company_id == company_id,
+        BookingForm.check_out_date >= start_date,
+        BookingForm.check_out_date <= end_date
+    ).all()
+    if not checkouts:
+        return []
+
+    # (unit_id, date) -> booking checking in that day
+    checkins = BookingForm.query.filter(
+        BookingForm.company_id == company_id,
+        BookingForm.check_in_date >= start_date,
+        BookingForm.check_in_date <= end_date
+    )
+    checkin_map = {(booking.unit_id, booking.check_in_date): booking for booking in checkins}
+
+    # unit_id -> cleaners assigned to it
+    assignments = db.session.query(cleaner_units.c.unit_id, User).join(
+        User, User.id == cleaner_units.c.user_id
+    ).filter(
+        cleaner_units.c.unit_id.in_({booking.unit_id for booking in checkouts}),
+        User.company_id == company_id,
+        User.is_cleaner.is_(True)
+    )
+    if cleaner_id:
+        assignments = assignments.filter(User.id == cleaner_id)
+    unit_cleaners = {}
+    for unit_id, cleaner in assignments:
+        unit_cleaners.setdefault(unit_id, []).append(cleaner)
+
+    schedules = {}
+    checkouts.sort(key=lambda booking: (booking.check_out_date, booking.unit.unit_number))
+    for checkout in checkouts:
+        cleaners = unit_cleaners.get(checkout.unit_id)
+        if not cleaners:
+            continue
+        checkin_booking = checkin_map.get((checkout.unit_id, checkout.check_out_date))
+        entry = {
+            'date': checkout.check_out_date,
+            'unit': checkout.unit,
+            'checkout': checkout,
+            'has_checkin': checkin_booking is not None,
+            'checkin_booking': checkin_booking,
+            **cleaning_supplies(checkout.unit, checkin_booking)
+        }
+        for cleaner in cleaners:
+            schedules.setdefault(cleaner.id, {'cleaner': cleaner, 'checkouts': []})['checkouts'].append(entry)
+
+    return sorted(schedules.values(), key=lambda schedule: schedule['cleaner'].name)
+
+
+def cleaning_plan_dates(args):
+    """
+    (start, end) dates of a cleaning plan request: date, or start and end, or
+    days from tomorrow (default 1, only tomorrow). Raises ValueError.
+    """
+    if args.get('start') or args.get('end'):
+        if not args.get('start'):
+            raise ValueError('start is required with end')
+        if not args.get('end'):
+            raise ValueError('end is required with start')
+        start_date = datetime.strptime(args['start'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(args['end'], '%Y-%m-%d').date()
+    elif args.get('date'):
+        start_date = end_date = datetime.strptime(args['date'], '%Y-%m-%d').date()
+    else:
+        start_date = datetime.now().date() + timedelta(days=1)
+        end_date = start_date + timedelta(days=args.get('days', 1, type=int) - 1)
+
+    if end_date < start_date:
+        raise ValueError('end must not be before start')
+    if (end_date - start_date).days >= CLEANING_PLAN_MAX_DAYS:
+        raise ValueError(f'At most {CLEANING_PLAN_MAX_DAYS} days')
+    return start_date, end_date
+
+
+def is_cleaning_manager(user):
+    return user.role.name == 'Manager' or user.is_admin
+
+
 @app.route('/cleaning-schedule')
 @login_required
 def cleaning_schedule():
     # Only cleaners and managers can access this page
-    if not current_user.is_cleaner and current_user.role.name != 'Manager' and not current_user.is_admin:
+    if not current_user.is_cleaner and not is_cleaning_manager(current_user):
         flash('You do not have permission to access this page.', 'danger')
         return redirect(url_for('dashboard'))
 
-    tomorrow = datetime.now().date() + timedelta(days=1)
-
-    # Get tomorrow's checkouts and check-ins
-    checkouts_tomorrow = BookingForm.query.filter(
-        BookingForm.check_out_date == tomorrow
-    ).all()
-
-    checkins_tomorrow = BookingForm.query.filter(
-        BookingForm.check_in_date == tomorrow
-    ).all()
-
-    # Map unit_id to checkin booking for fast lookups
-    checkin_map = {booking.unit_id: booking for booking in checkins_tomorrow}
+    try:
+        start_date, end_date = cleaning_plan_dates(request.args)
+    except ValueError as e:
+        flash(f'Invalid dates: {str(e)}', 'danger')
+        start_date = end_date = datetime.now().date() + timedelta(days=1)
 
     # For managers, show all cleaners' schedules
-    if current_user.role.name == 'Manager' or current_user.is_admin:
-        cleaners = User.query.filter_by(company_id=current_user.company_id, is_cleaner=True).all()
-
-        cleaner_schedules = []
-        for cleaner in cleaners:
-            # Get units assigned to this cleaner that have checkouts tomorrow
-            assigned_units = cleaner.assigned_units
-            cleaner_checkouts = []
-
-            for unit in assigned_units:
-                for checkout in checkouts_tomorrow:
-                    if checkout.unit_id == unit.id:
-                        # Check if there's a check-in tomorrow for this unit
-                        has_checkin = unit.id in checkin_map
-                        checkin_booking = checkin_map.get(unit.id)
-
-                        # Calculate supplies based on whether there's a check-in tomorrow
-                        if has_checkin:
-                            towels = checkin_booking.number_of_guests
-                            rubbish_bags = checkin_booking.number_of_nights
-                            toilet_rolls = checkin_booking.number_of_nights * (unit.toilet_count or 1)
-                        else:
-                            towels = unit.towel_count or 2
-                            rubbish_bags = 2
-                            toilet_rolls = 2 * (unit.toilet_count or 1)
-
-                        cleaner_checkouts.append({
-                            'unit': unit,
-                            'checkout': checkout,
-                            'has_checkin': has_checkin,
-                            'checkin_booking': checkin_booking,
-                            'towels': towels,
-                            'rubbish_bags': rubbish_bags,
-                            'toilet_rolls': toilet_rolls
-                        })
-
-            if cleaner_checkouts:
-                cleaner_schedules.append({
-                    'cleaner': cleaner,
-                    'checkouts': cleaner_checkouts
-                })
-
+    if is_cleaning_manager(current_user):
+        cleaner_schedules = build_cleaning_plan(current_user.company_id, start_date, end_date)
         return render_template('cleaning_schedule_manager.html',
                                cleaner_schedules=cleaner_schedules,
-                               tomorrow=tomorrow)
+                               start_date=start_date,
+                               end_date=end_date,
+                               tomorrow=datetime.now().date() + timedelta(days=1))
 
     # For cleaners, show only their assigned units
-    else:
-        assigned_units = current_user.assigned_units
-        my_checkouts = []
-
-        for unit in assigned_units:
-            for checkout in checkouts_tomorrow:
-                if checkout.unit_id == unit.id:
-                    # Check if there's a check-in tomorrow for this unit
-                    has_checkin = unit.id in checkin_map
-                    checkin_booking = checkin_map.get(unit.id)
-
-                    # Calculate supplies based on whether there's a check-in tomorrow
-                    if has_checkin:
-                        towels = checkin_booking.number_of_guests
-                        rubbish_bags = checkin_booking.number_of_nights
-                        toilet_rolls = checkin_booking.number_of_nights * (unit.toilet_count or 1)
-                    else:
-                        towels = unit.towel_count or 2
-                        rubbish_bags = 2
-                        toilet_rolls = 2 * (unit.toilet_count or 1)
+    schedules = build_cleaning_plan(current_user.company_id, start_date, end_date, cleaner_id=current_user.id)
+    return render_template('cleaning_schedule.html',
+                           checkouts=schedules[0]['checkouts'] if schedules else [],
+                           start_date=start_date,
+                           end_date=end_date,
+                           tomorrow=datetime.now().date() + timedelta(days=1))
+
+
+@app.route('/api/cleaning-schedule')
+@login_required
+def get_cleaning_schedule():
+    """
+    The cleaning plan as JSON for the same dates as /cleaning-schedule (date,
+    start/end or days): every cleaner's plan for managers, their own for cleaners.
+    """
+    if not current_user.is_cleaner and not is_cleaning_manager(current_user):
+        return jsonify({'error': 'Not authorized'}), 403
+
+    try:
+        start_date, end_date = cleaning_plan_dates(request.args)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid dates: {str(e)}'}), 400
 
-                    my_checkouts.append({
-                        'unit': unit,
-                        'checkout': checkout,
-                        'has_checkin': has_checkin,
-                        'checkin_booking': checkin_booking,
-                        'towels': towels,
-                        'rubbish_bags': rubbish_bags,
-                        'toilet_rolls': toilet_rolls
-                    })
+    cleaner_id = None if is_cleaning_manager(current_user) else current_user.id
+    schedules = build_cleaning_plan(current_user.company_id, start_date, end_date, cleaner_id=cleaner_id)
 
-        return render_template('cleaning_schedule.html',
-                               checkouts=my_checkouts,
-                               tomorrow=tomorrow)
+    return jsonify({
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'schedules': [{
+            'cleaner': {
+                'id': schedule['cleaner'].id,
+                'name': schedule['cleaner'].name,
+                'phone_number': schedule['cleaner'].phone_number
+            },
+            'checkouts': [{
+                'date': entry['date'].isoformat(),
+                'unit_id': entry['unit'].id,
+                'unit_number': entry['unit'].unit_number,
+                'building': entry['unit'].building,
+                'booking_id': entry['checkout'].id,
+                'guest_name': entry['checkout'].guest_name,
+                'has_checkin': entry['has_checkin'],
+                'checkin_booking_id': entry['checkin_booking'].id if entry['checkin_booking'] else None,
+                'towels': entry['towels'],
+                'rubbish_bags': entry['rubbish_bags'],
+                'toilet_rolls': entry['toilet_rolls']
+            } for entry in schedule['checkouts']]
+        } for schedule in schedules]
+    })
 
 
 # Add this route to app.py to support the calendar view
@@ -2461,25 +3080,17 @@ def analytics():
                            units=units)
 
 
-# Add or update this route in app.py
-
-@app.route('/api/analytics/issues')
-@login_required
-def get_analytics_issues():
-    # Filter for current user's company
-    company_id = current_user.company_id
-
-    # Get filter parameters
-    days = request.args.get('days', type=int)
-    time_filter = request.args.get('time_filter')  # New parameter for special time filters
-    category_id = request.args.get('category_id', type=int)
-    priority_id = request.args.get('priority_id', type=int)
-    status_id = request.args.get('status_id', type=int)
-    unit = request.args.get('unit')
-    view_type = request.args.get('view_type')  # New parameter: 'hourly' or 'monthly'
-
-    # Start with base query for issues in user's company
-    query = Issue.query.filter_by(company_id=company_id)
+def filter_analytics_issues(query, args):
+    """
+    Apply the analytics page filters in args (days or time_filter, category_id,
+    priority_id, status_id, unit) to a query over Issue
+    """
+    days = args.get('days', type=int)
+    time_filter = args.get('time_filter')  # Special time filters: 'hour', 'today' or 'yesterday'
+    category_id = args.get('category_id', type=int)
+    priority_id = args.get('priority_id', type=int)
+    status_id = args.get('status_id', type=int)
+    unit = args.get('unit')
 
     # Apply date filter with calendar-based logic
     if days:
@@ -2513,16 +3124,32 @@ def get_analytics_issues():
 
     # Apply other filters if specified
     if category_id:
-        query = query.filter_by(category_id=category_id)
+        query = query.filter(Issue.category_id == category_id)
 
     if priority_id:
-        query = query.filter_by(priority_id=priority_id)
+        query = query.filter(Issue.priority_id == priority_id)
 
     if status_id:
-        query = query.filter_by(status_id=status_id)
+        query = query.filter(Issue.status_id == status_id)
 
     if unit:
-        query = query.filter_by(unit=unit)
+        query = query.filter(Issue.unit == unit)
+
+    return query
+
+
+# Add or update this route in app.py
+
+@app.route('/api/analytics/issues')
+@login_required
+def get_analytics_issues():
+    # Filter for current user's company
+    company_id = current_user.company_id
+
+    # Start with base query for issues in user's company
+    query = filter_analytics_issues(
+        Issue.query.options(*issue_load_options('analytics')).filter_by(company_id=company_id), request.args
+    )
 
     # Execute query
     issues = query.all()
@@ -2564,55 +3191,150 @@ def get_analytics_issues():
     return jsonify(result)
 
 
-# API endpoint to get summary statistics
-@app.route('/api/analytics/summary')
+@app.route('/api/analytics/issues/aggregate')
 @login_required
-def get_analytics_summary():
+def get_analytics_issues_aggregate():
+    """
+    The analytics charts' series, grouped in the database under the same filters
+    as /api/analytics/issues instead of shipping every issue to the browser:
+    totals for the stat cards, counts and cost sums by category, status,
+    priority, issue item and unit, unit x category counts, counts by month and
+    priority, and today's counts by hour (Malaysia time).
+    """
     company_id = current_user.company_id
 
-    # Get total issues count
-    total_issues = Issue.query.filter_by(company_id=company_id).count()
+    # One GROUP BY per chart dimension, sent as a single UNION ALL, so the rows
+    # are bounded by the lookup values rather than by the issues
+    def grouped(dimension, name, detail=None, joins=()):
+        query = db.session.query(
+            literal(dimension).label('dimension'),
+            name.label('name'),
+            (detail if detail is not None else cast(null(), String)).label('detail'),
+            func.count(Issue.id).label('count'),
+            func.sum(Issue.cost).label('cost')
+        ).select_from(Issue)
+        for model, column in joins:
+            query = query.outerjoin(model, column == model.id)
+        query = filter_analytics_issues(query.filter(Issue.company_id == company_id), request.args)
+        return query.group_by(name) if detail is None else query.group_by(name, detail)
+
+    category_join = (Category, Issue.category_id)
+    groups = grouped('category', Category.name, joins=[category_join]).union_all(
+        grouped('priority', Priority.name, joins=[(Priority, Issue.priority_id)]),
+        grouped('status', Status.name, joins=[(Status, Issue.status_id)]),
+        grouped('issue_item', IssueItem.name, joins=[(IssueItem, Issue.issue_item_id)]),
+        grouped('unit', Issue.unit),
+        grouped('unit_category', Issue.unit, Category.name, joins=[category_join])
+    ).all()
+
+    series = {'category': {}, 'priority': {}, 'status': {}, 'issue_item': {}, 'unit': {}}
+    unit_categories = {}
+    total_issues = 0
+    total_cost = 0
+    for dimension, name, detail, count, cost in groups:
+        if dimension == 'unit_category':
+            if name and detail:
+                unit_categories[(name, detail)] = count
+            continue
+        # cost stays None for groups where no issue has a cost
+        series[dimension][name] = {'name': name, 'count': count, 'cost': float(cost) if cost is not None else None}
+        # Every issue is in exactly one category group
+        if dimension == 'category':
+            total_issues += count
+            total_cost += float(cost or 0)
+
+    status_counts = {entry['name']: entry['count'] for entry in series['status'].values()}
+
+    # Issues per month and priority
+    year = func.extract('year', Issue.date_added)
+    month = func.extract('month', Issue.date_added)
+    monthly = filter_analytics_issues(db.session.query(
+        year, month, Priority.name, func.count(Issue.id)
+    ).select_from(Issue).outerjoin(
+        Priority, Issue.priority_id == Priority.id
+    ).filter(
+        Issue.company_id == company_id
+    ), request.args).group_by(year, month, Priority.name)
 
-    # Get open issues count (Pending or In Progress)
-    pending_status = Status.query.filter_by(name='Pending').first()
-    in_progress_status = Status.query.filter_by(name='In Progress').first()
+    by_month = [{'month': f"{int(issue_year)}-{int(issue_month):02d}", 'priority': priority, 'count': count}
+                for issue_year, issue_month, priority, count in monthly]
+    by_month.sort(key=lambda entry: entry['month'])
 
-    open_issues_filter = []
-    if pending_status:
-        open_issues_filter.append(Issue.status_id == pending_status.id)
-    if in_progress_status:
-        open_issues_filter.append(Issue.status_id == in_progress_status.id)
+    # Today's issues per hour; date_added is UTC, the chart shows Malaysia time
+    malaysia_tz = pytz.timezone('Asia/Kuala_Lumpur')
+    now_local = datetime.now(malaysia_tz)
+    today_start = now_local.replace(hour=0, minute=0, second=0, microsecond=0).astimezone(pytz.utc).replace(tzinfo=None)
+    offset_hours = int(now_local.utcoffset().total_seconds() // 3600)
+    hour = func.extract('hour', Issue.date_added)
+    hourly = filter_analytics_issues(db.session.query(hour, func.count(Issue.id)).filter(
+        Issue.company_id == company_id,
+        Issue.date_added >= today_start,
+        Issue.date_added < today_start + timedelta(days=1)
+    ), request.args).group_by(hour)
 
-    open_issues = 0
-    if open_issues_filter:
-        open_issues = Issue.query.filter_by(company_id=company_id).filter(db.or_(*open_issues_filter)).count()
+    by_hour = [0] * 24
+    for utc_hour, count in hourly:
+        by_hour[(int(utc_hour) + offset_hours) % 24] += count
 
-    # Get resolved issues count
-    resolved_status = Status.query.filter_by(name='Resolved').first()
-    resolved_issues = 0
-    if resolved_status:
-        resolved_issues = Issue.query.filter_by(company_id=company_id, status_id=resolved_status.id).count()
+    def ordered(name):
+        return sorted(series[name].values(), key=lambda entry: -entry['count'])
 
-    # Calculate average cost
-    avg_cost_result = db.session.query(func.avg(Issue.cost)).filter(
-        Issue.company_id == company_id,
-        Issue.cost.isnot(None)
-    ).scalar()
-    avg_cost = float(avg_cost_result) if avg_cost_result else 0
+    return jsonify({
+        'total': total_issues,
+        'open': status_counts.get('Pending', 0) + status_counts.get('In Progress', 0),
+        'resolved': status_counts.get('Resolved', 0),
+        'total_cost': round(total_cost, 2),
+        'by_category': ordered('category'),
+        'by_priority': ordered('priority'),
+        'by_status': ordered('status'),
+        'by_issue_item': ordered('issue_item'),
+        'by_unit': ordered('unit'),
+        'by_unit_category': [{'unit': unit, 'category': category, 'count': count}
+                             for (unit, category), count in sorted(unit_categories.items())],
+        'by_month': by_month,
+        'by_hour': by_hour
+    })
 
-    # Get top issue categories
-    category_counts = db.session.query(
-        Category.name,
-        func.count(Issue.id).label('count')
-    ).join(
-        Issue, Issue.category_id == Category.id
+
+# API endpoint to get summary statistics
+@app.route('/api/analytics/summary')
+@login_required
+def get_analytics_summary():
+    company_id = current_user.company_id
+    status_ids = lookup_ids(Status)
+
+    # Open issues are Pending or In Progress
+    open_status_ids = [status_ids[name] for name in ('Pending', 'In Progress') if name in status_ids]
+    is_open = Issue.status_id.in_(open_status_ids)
+    is_resolved = Issue.status_id == status_ids['Resolved'] if 'Resolved' in status_ids else literal(False)
+
+    # Every figure comes from one conditional-aggregate query grouped by
+    # category; the totals are the sums over the categories
+    rows = db.session.query(
+        Issue.category_id,
+        func.count(Issue.id),
+        func.sum(case((is_open, 1), else_=0)),
+        func.sum(case((is_resolved, 1), else_=0)),
+        func.sum(Issue.cost),
+        func.count(Issue.cost)
     ).filter(
         Issue.company_id == company_id
-    ).group_by(
-        Category.name
-    ).order_by(
-        func.count(Issue.id).desc()
-    ).limit(5).all()
+    ).group_by(Issue.category_id).all()
+
+    total_issues = sum(row[1] for row in rows)
+    open_issues = sum(int(row[2] or 0) for row in rows)
+    resolved_issues = sum(int(row[3] or 0) for row in rows)
+
+    # Average cost of the issues that have one
+    cost_count = sum(row[5] for row in rows)
+    avg_cost = float(sum(Decimal(str(row[4] or 0)) for row in rows) / cost_count) if cost_count else 0
+
+    # Get top issue categories
+    category_names = {category_id: name for name, category_id in lookup_ids(Category).items()}
+    category_counts = sorted(
+        ((category_names[category_id], count) for category_id, count, *_ in rows if category_id in category_names),
+        key=lambda item: -item[1]
+    )[:5]
 
     top_categories = [{'name': name, 'count': count} for name, count in category_counts]
 
@@ -2628,178 +3350,342 @@ def get_analytics_summary():
 
 
 ####### ics#################
-def process_ics_calendar(calendar_data, unit_id, source):
-    """Process ICS calendar data and handle bookings based on confirmation codes"""
-    from icalendar import Calendar
-    from datetime import datetime
-    import re
+# Backslash escapes allowed in ICS text values (RFC 5545 3.3.11)
+ICS_ESCAPE_RE = re.compile(r'\\([\\;,nN])')
 
-    # Parse the ICS data
-    try:
-        cal = Calendar.from_ical(calendar_data)
-    except Exception as e:
-        print(f"Error parsing calendar: {str(e)}")
-        return 0, 0, 0  # Return (added, updated, cancelled)
 
-    unit = Unit.query.get(unit_id)
-    if not unit:
-        return 0, 0, 0
+def join_ics_line(parts):
+    """Content line from its folded parts, decoded once joined"""
+    if isinstance(parts[0], bytes):
+        return b''.join(parts).decode('utf-8', errors='replace')
+    return ''.join(parts)
+
+
+def unfold_ics_lines(lines):
+    """
+    Join folded ICS content lines back together (continuations start with a space or tab).
+    Byte lines are decoded after unfolding, as folds (every 75 octets) can split
+    a multi-byte UTF-8 character.
+    """
+    current = None
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.rstrip(b'\r\n').lstrip(b'\xef\xbb\xbf')
+        else:
+            line = line.rstrip('\r\n').lstrip('\ufeff')
+        if not line:
+            continue
+        if line[:1] in (' ', '\t', b' ', b'\t'):
+            if current is not None:
+                current.append(line[1:])
+            continue
+        if current is not None:
+            yield join_ics_line(current)
+        current = [line]
+    if current is not None:
+        yield join_ics_line(current)
 
-    bookings_added = 0
-    bookings_updated = 0
-    bookings_cancelled = 0
 
-    # Collect all confirmation codes and their details from the ICS calendar
-    current_bookings = {}  # Dict to store confirmation_code -> booking details
+def split_ics_property(line):
+    """Split a content line into (NAME, value), ignoring colons inside quoted parameters"""
+    quoted = False
+    for index, char in enumerate(line):
+        if char == '"':
+            quoted = not quoted
+        elif char == ':' and not quoted:
+            return line[:index].split(';', 1)[0].upper(), line[index + 1:]
+    return line.split(';', 1)[0].upper(), ''
 
-    for component in cal.walk():
-        if component.name == "VEVENT":
-            # Skip blocked dates or unavailable periods
-            summary = str(component.get('summary', 'Booking'))
-            if "blocked" in summary.lower() or "unavailable" in summary.lower():
-                continue
 
-            description = str(component.get('description', ''))
+def unescape_ics_text(value):
+    """Undo the backslash escaping of an ICS text value"""
+    return ICS_ESCAPE_RE.sub(lambda match: '\n' if match.group(1) in 'nN' else match.group(1), value)
 
-            # Extract confirmation code from the description field
-            confirmation_code = ""
 
-            # For Airbnb: Extract from URL like https://www.airbnb.com/hosting/reservations/details/HMN8ZKWAQE
-            if source == "Airbnb":
-                url_match = re.search(r'reservations/details/([A-Z0-9]+)', description)
-                if url_match:
-                    confirmation_code = url_match.group(1)
+def parse_ics_date(value):
+    """Date of a DTSTART/DTEND value (YYYYMMDD or YYYYMMDDTHHMMSS[Z])"""
+    return date(int(value[0:4]), int(value[4:6]), int(value[6:8]))
 
-            # For other platforms - adapt as needed
-            elif source == "Booking.com":
-                booking_match = re.search(r'Booking ID:\s*(\d+)', description)
-                if booking_match:
-                    confirmation_code = booking_match.group(1)
 
-            # If no valid confirmation code found, skip this entry
-            if not confirmation_code:
+def iter_ics_events(lines):
+    """
+    Stream the events of an ICS feed without building the whole calendar in memory.
+    lines can be any iterable of str or bytes lines (an open file, response.iter_lines()).
+    Yields dicts with summary, description, dtstart and dtend (dates). Blocked or
+    unavailable events are skipped as soon as their summary is read.
+    Raises ValueError if the data is not an iCalendar feed.
+    """
+    in_calendar = False
+    event = None
+    skipping = False
+    depth = 0  # nesting of sub-components such as VALARM inside the current event
+
+    for line in unfold_ics_lines(lines):
+        name, value = split_ics_property(line)
+
+        if not in_calendar:
+            if name != 'BEGIN' or value.strip().upper() != 'VCALENDAR':
+                raise ValueError("Data is not an iCalendar feed")
+            in_calendar = True
+            continue
+
+        if event is None:
+            if name == 'BEGIN' and value.strip().upper() == 'VEVENT':
+                event = {'summary': 'Booking', 'description': '', 'dtstart': None, 'dtend': None}
+                skipping = False
+                depth = 0
+            continue
+
+        if name == 'BEGIN':
+            depth += 1
+        elif name == 'END':
+            if depth:
+                depth -= 1
                 continue
+            # End of the event
+            if not skipping and event['dtstart'] and event['dtend']:
+                yield event
+            event = None
+        elif skipping or depth:
+            continue
+        elif name == 'SUMMARY':
+            event['summary'] = unescape_ics_text(value)
+            # Skip blocked dates or unavailable periods
+            summary = event['summary'].lower()
+            if "blocked" in summary or "unavailable" in summary:
+                skipping = True
+        elif name == 'DESCRIPTION':
+            event['description'] = unescape_ics_text(value)
+        elif name in ('DTSTART', 'DTEND'):
+            event[name.lower()] = parse_ics_date(value.strip())
 
-            # Get start and end dates
-            start_date = component.get('dtstart').dt
-            end_date = component.get('dtend').dt
-
-            # Convert datetime objects to date objects if needed
-            if isinstance(start_date, datetime):
-                start_date = start_date.date()
-            if isinstance(end_date, datetime):
-                end_date = end_date.date()
-
-            # Calculate number of nights
-            nights = (end_date - start_date).days
-
-            # Extract guest name from summary or description
-            guest_name = extract_guest_name(summary, description) or f"Guest from {source}"
-
-            # Store booking details
-            current_bookings[confirmation_code] = {
-                'check_in_date': start_date,
-                'check_out_date': end_date,
-                'number_of_nights': nights,
-                'guest_name': guest_name,
-                'description': description
-            }
 
-    # Get existing bookings from database for this unit and source
-    existing_bookings = BookingForm.query.filter_by(
-        unit_id=unit_id,
-        booking_source=source
-    ).all()
+def collect_ics_bookings(events, source):
+    """
+    Bookings of ICS calendar events (from iter_ics_events) as confirmation_code ->
+    booking details. Events without a confirmation code are dropped as they stream
+    past, so only the bookings are kept in memory. Raises ValueError on unparseable feeds.
+    """
+    current_bookings = {}
 
-    # Check existing bookings against current calendar data
-    existing_codes = set()
-    for booking in existing_bookings:
-        # Skip bookings without a confirmation code
-        if not booking.confirmation_code:
+    for event in events:
+        summary = event['summary']
+        description = event['description']
+
+        # Extract confirmation code from the description field
+        confirmation_code = extract_confirmation_code(source, description)
+
+        # If no valid confirmation code found, skip this entry
+        if not confirmation_code:
             continue
 
-        existing_codes.add(booking.confirmation_code)
+        # Get start and end dates
+        start_date = event['dtstart']
+        end_date = event['dtend']
 
-        if booking.confirmation_code in current_bookings:
-            # Booking still exists, check if details need updating
-            current_data = current_bookings[booking.confirmation_code]
+        # Calculate number of nights
+        nights = (end_date - start_date).days
 
-            needs_update = (
-                    booking.check_in_date != current_data['check_in_date'] or
-                    booking.check_out_date != current_data['check_out_date'] or
-                    booking.number_of_nights != current_data['number_of_nights']
-            )
+        # Extract guest name from summary or description
+        guest_name = extract_guest_name(summary, description, source) or f"Guest from {source}"
 
-            if needs_update:
-                # Update booking details but preserve other fields
-                booking.check_in_date = current_data['check_in_date']
-                booking.check_out_date = current_data['check_out_date']
-                booking.number_of_nights = current_data['number_of_nights']
-                # Only update guest name if it's not already set to something more specific
-                if booking.guest_name == f"Guest from {source}" or not booking.guest_name:
-                    booking.guest_name = current_data['guest_name']
-                booking.notes = f"Updated from {source} calendar: {current_data['description']}"
-                bookings_updated += 1
-        else:
+        # Store booking details
+        current_bookings[confirmation_code] = {
+            'check_in_date': start_date,
+            'check_out_date': end_date,
+            'number_of_nights': nights,
+            'guest_name': guest_name,
+            'description': description
+        }
+
+    return current_bookings
+
+
+def process_ics_calendar(events, unit_id, source, user_id=None, commit=True):
+    """
+    Process ICS calendar events (from iter_ics_events) and handle bookings based on confirmation codes.
+    See process_ics_bookings for the arguments and the change report.
+    """
+    try:
+        current_bookings = collect_ics_bookings(events, source)
+    except ValueError as e:
+        print(f"Error parsing calendar: {str(e)}")
+        return {'added': [], 'updated': [], 'cancelled': [], 'unchanged': [],
+                'error': f"Error parsing calendar: {str(e)}"}
+    return process_ics_bookings(current_bookings, unit_id, source, user_id=user_id, commit=commit)
+
+
+def process_ics_bookings(current_bookings, unit_id, source, user_id=None, commit=True):
+    """
+    Apply the bookings of a feed (from collect_ics_bookings) to a unit.
+    user_id is recorded on new bookings (defaults to the current user); with
+    commit=False the changes are only flushed so the caller can batch them.
+    Returns a change report: the confirmation codes that were added, updated,
+    cancelled or left unchanged, and an error message if the feed was unreadable
+    or the unit doesn't exist.
+    """
+    report = {'added': [], 'updated': [], 'cancelled': [], 'unchanged': [], 'error': None}
+
+    unit = Unit.query.get(unit_id)
+    if not unit:
+        report['error'] = 'Unit not found'
+        return report
+
+    # Load only the columns needed to diff existing bookings against the feed
+    existing_bookings = db.session.query(
+        BookingForm.id,
+        BookingForm.confirmation_code,
+        BookingForm.check_in_date,
+        BookingForm.check_out_date,
+        BookingForm.number_of_nights,
+        BookingForm.guest_name
+    ).filter(
+        BookingForm.unit_id == unit_id,
+        BookingForm.booking_source == source,
+        BookingForm.confirmation_code.isnot(None),
+        BookingForm.confirmation_code != ''
+    ).all()
+
+    existing_codes = {booking.confirmation_code for booking in existing_bookings}
+    current_codes = set(current_bookings)
+
+    # Set-based diff: bookings only in the feed are new, bookings only in the
+    # database were cancelled, bookings in both are updated if their dates moved
+    inserts = []
+    for confirmation_code in current_codes - existing_codes:
+        details = current_bookings[confirmation_code]
+        inserts.append({
+            'guest_name': details['guest_name'],
+            'contact_number': f"Imported from {source}",
+            'check_in_date': details['check_in_date'],
+            'check_out_date': details['check_out_date'],
+            'property_name': unit.building or "Property",
+            'unit_id': unit.id,
+            'number_of_nights': details['number_of_nights'],
+            'number_of_guests': 2,  # Default value
+            'price': 0,  # Default value, to be updated later
+            'booking_source': source,
+            'payment_status': "Pending",
+            'notes': f"Imported from {source} calendar: {details['description']}",
+            'company_id': unit.company_id,
+            'user_id': user_id or current_user.id,
+            'confirmation_code': confirmation_code
+        })
+
+    report['added'] = sorted(current_codes - existing_codes)
+    updates = []
+    cancelled_ids = []
+
+    for booking in existing_bookings:
+        code = booking.confirmation_code
+        if code not in current_bookings:
             # Booking no longer exists in calendar - handle as cancelled
-            db.session.delete(booking)
-            bookings_cancelled += 1
-
-    # Add new bookings (those in calendar but not in database)
-    for confirmation_code, details in current_bookings.items():
-        if confirmation_code not in existing_codes:
-            # This is a new booking to add
-            new_booking = BookingForm(
-                guest_name=details['guest_name'],
-                contact_number=f"Imported from {source}",
-                check_in_date=details['check_in_date'],
-                check_out_date=details['check_out_date'],
-                property_name=unit.building or "Property",
-                unit_id=unit_id,
-                number_of_nights=details['number_of_nights'],
-                number_of_guests=2,  # Default value
-                price=0,  # Default value, to be updated later
-                booking_source=source,
-                payment_status="Pending",
-                notes=f"Imported from {source} calendar: {details['description']}",
-                company_id=unit.company_id,
-                user_id=current_user.id,
-                confirmation_code=confirmation_code
-            )
+            cancelled_ids.append(booking.id)
+            report['cancelled'].append(code)
+            continue
 
-            db.session.add(new_booking)
-            bookings_added += 1
+        current_data = current_bookings[code]
+        needs_update = (
+                booking.check_in_date != current_data['check_in_date'] or
+                booking.check_out_date != current_data['check_out_date'] or
+                booking.number_of_nights != current_data['number_of_nights']
+        )
+        if not needs_update:
+            report['unchanged'].append(code)
+            continue
+
+        # Update booking details but preserve other fields
+        values = {
+            'id': booking.id,
+            'check_in_date': current_data['check_in_date'],
+            'check_out_date': current_data['check_out_date'],
+            'number_of_nights': current_data['number_of_nights'],
+            'notes': f"Updated from {source} calendar: {current_data['description']}"
+        }
+        # Only update guest name if it's not already set to something more specific
+        if booking.guest_name == f"Guest from {source}" or not booking.guest_name:
+            values['guest_name'] = current_data['guest_name']
+        updates.append(values)
+        report['updated'].append(code)
+
+    # Apply the whole diff with one statement per kind of change
+    changed_ids = [values['id'] for values in updates]
+    if inserts:
+        changed_ids += db.session.execute(insert(BookingForm).returning(BookingForm.id), inserts).scalars().all()
+    if updates:
+        # Rows differ in which columns they set, so group them for executemany
+        for columns in {tuple(sorted(values)) for values in updates}:
+            db.session.execute(update(BookingForm), [values for values in updates if tuple(sorted(values)) == columns])
+    if cancelled_ids:
+        clear_unit_nights(cancelled_ids)
+        db.session.execute(
+            delete(BookingForm).where(BookingForm.id.in_(cancelled_ids)).execution_options(synchronize_session=False)
+        )
+    if changed_ids:
+        refresh_unit_nights(changed_ids)
 
     # Commit all changes
-    if bookings_added > 0 or bookings_updated > 0 or bookings_cancelled > 0:
-        db.session.commit()
+    if inserts or updates or cancelled_ids:
+        if commit:
+            db.session.commit()
+        else:
+            db.session.flush()
 
-    return bookings_added, bookings_updated, bookings_cancelled
+    return report
 
 
-def extract_guest_name(summary, description):
-    """Extract guest name from summary or description"""
-    # Different platforms use different formats for guest information
+# Guest name patterns as (markers, compiled pattern); a pattern is only run on
+# text containing one of its markers. Tried in order, summary before description.
+DEFAULT_GUEST_NAME_PATTERNS = [
+    (('Booking for', 'Guest:', 'Reserved by', 'Reservation for'),
+     re.compile(r"(?:Booking for|Guest:|Reserved by|Reservation for)\s+([A-Za-z\s]+)")),
+    (("'s reservation",), re.compile(r"([A-Za-z\s]+)'s reservation"))
+]
 
-    # Try to find patterns like "Booking for John Doe" or "Guest: John Doe"
-    import re
+# booking_source -> how to read its ICS events, see register_booking_source()
+BOOKING_SOURCE_EXTRACTORS = {}
 
-    # Try various patterns
-    patterns = [
-        r"(?:Booking for|Guest:|Reserved by|Reservation for)\s+([A-Za-z\s]+)",
-        r"([A-Za-z\s]+)'s reservation"
-    ]
 
-    for pattern in patterns:
-        # Search in summary
-        match = re.search(pattern, summary)
-        if match:
-            return match.group(1).strip()
+def register_booking_source(source, code_marker, code_pattern, guest_name_patterns=None):
+    """
+    Register how to read ICS events of a booking source (OTA).
+    code_pattern is searched in the event description, only when it contains
+    code_marker, and its first group is the confirmation code.
+    guest_name_patterns defaults to DEFAULT_GUEST_NAME_PATTERNS.
+    """
+    BOOKING_SOURCE_EXTRACTORS[source] = {
+        'code_marker': code_marker,
+        'code_pattern': re.compile(code_pattern),
+        'guest_name_patterns': guest_name_patterns or DEFAULT_GUEST_NAME_PATTERNS
+    }
+
+
+# Airbnb: URL like https://www.airbnb.com/hosting/reservations/details/HMN8ZKWAQE
+register_booking_source('Airbnb', 'reservations/details/', r'reservations/details/([A-Z0-9]+)')
+register_booking_source('Booking.com', 'Booking ID:', r'Booking ID:\s*(\d+)')
+
+
+def extract_confirmation_code(source, description):
+    """Extract the confirmation code from an ICS event description, or "" if there is none"""
+    extractor = BOOKING_SOURCE_EXTRACTORS.get(source)
+    if not extractor or extractor['code_marker'] not in description:
+        return ""
+    match = extractor['code_pattern'].search(description)
+    return match.group(1) if match else ""
+
 
-        # Search in description
-        match = re.search(pattern, description)
-        if match:
-            return match.group(1).strip()
+def extract_guest_name(summary, description, source=None):
+    """Extract guest name from summary or description"""
+    # Different platforms use different formats for guest information
+    extractor = BOOKING_SOURCE_EXTRACTORS.get(source)
+    patterns = extractor['guest_name_patterns'] if extractor else DEFAULT_GUEST_NAME_PATTERNS
+
+    for markers, pattern in patterns:
+        for text in (summary, description):
+            if any(marker in text for marker in markers):
+                match = pattern.search(text)
+                if match:
+                    return match.group(1).strip()
 
     # If no pattern matches, try to use the summary as is
     if summary and len(summary) < 50 and not any(x in summary.lower() for x in ["booking", "reservation", "blocked"]):
@@ -2820,6 +3706,12 @@ def update_calendar_source(unit_id, source_name, source_url=None):
         calendar_source.last_updated = datetime.utcnow()
         if source_url:
             calendar_source.source_url = source_url
+
+        # A manual import changes the bookings independently of the feed, so
+        # the next sync must download and process the feed in full
+        calendar_source.etag = None
+        calendar_source.last_modified = None
+        calendar_source.content_hash = None
     else:
         # Create new record
         calendar_source = CalendarSource(
@@ -2834,23 +3726,195 @@ def update_calendar_source(unit_id, source_name, source_url=None):
     return calendar_source
 
 
-def sync_all_calendars():
-    """Sync all calendar sources that have URLs"""
-    calendar_sources = CalendarSource.query.filter(CalendarSource.source_url.isnot(None)).all()
+# Calendar sync settings
+CALENDAR_SYNC_WORKERS = int(os.environ.get('CALENDAR_SYNC_WORKERS', 8))  # concurrent feed downloads
+CALENDAR_SYNC_TIMEOUT = float(os.environ.get('CALENDAR_SYNC_TIMEOUT', 30))  # hard limit per feed, in seconds
+CALENDAR_SYNC_HOST_INTERVAL = float(os.environ.get('CALENDAR_SYNC_HOST_INTERVAL', 0.5))  # seconds between requests to one host
+CALENDAR_SYNC_BATCH_SIZE = int(os.environ.get('CALENDAR_SYNC_BATCH_SIZE', 25))  # sources per transaction
+
+
+class HostRateLimiter:
+    """Spaces out requests to the same host across worker threads"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.next_slot = {}
+
+    def wait(self, host):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def create_calendar_http_session(pool_size=CALENDAR_SYNC_WORKERS):
+    """requests session with a keep-alive connection pool shared by the sync workers"""
+    http = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    http.mount('https://', adapter)
+    http.mount('http://', adapter)
+    return http
+
+
+def fetch_calendar_feed(http, url, source, rate_limiter=None, timeout=CALENDAR_SYNC_TIMEOUT, etag=None,
+                        last_modified=None):
+    """
+    Download the ICS feed of a booking source, giving up once the whole download
+    exceeds the timeout. When etag/last_modified are given the request is conditional.
+    The feed is parsed line by line as it arrives and only its bookings are kept.
+    Returns a dict with not_modified, bookings (see collect_ics_bookings),
+    content_hash, etag and last_modified; raises on HTTP errors, timeouts and
+    unparseable feeds.
+    """
+    if rate_limiter:
+        rate_limiter.wait(urlparse(url).netloc)
+
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    deadline = time.monotonic() + timeout
+    with http.get(url, headers=headers, timeout=(min(timeout, 10), timeout), stream=True) as response:
+        feed = {
+            'not_modified': response.status_code == 304,
+            'bookings': None,
+            'content_hash': None,
+            # Keep the previous validators if the server didn't send new ones
+            'etag': response.headers.get('ETag') or etag,
+            'last_modified': response.headers.get('Last-Modified') or last_modified
+        }
+        if feed['not_modified']:
+            return feed
+        if response.status_code != 200:
+            raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+
+        # A feed trickling in slowly never trips the read timeout, so close the
+        # connection from a watchdog once the overall deadline has passed
+        watchdog = threading.Timer(max(deadline - time.monotonic(), 0), response.close)
+        watchdog.start()
+        digest = hashlib.sha256()
+
+        def hashed_lines():
+            for line in response.iter_lines(chunk_size=8 * 1024):
+                if line:
+                    digest.update(line + b'\n')
+                    yield line
 
-    for source in calendar_sources:
         try:
-            # Download the ICS file
-            response = requests.get(source.source_url)
-            if response.status_code == 200:
-                calendar_data = response.text
-                # Process the calendar
-                process_ics_calendar(calendar_data, source.unit_id, source.source_name)
-                # Update the last_updated timestamp
-                source.last_updated = datetime.utcnow()
-                db.session.commit()
-        except Exception as e:
-            print(f"Error syncing calendar for {source.unit.unit_number} from {source.source_name}: {str(e)}")
+            bookings = collect_ics_bookings(iter_ics_events(hashed_lines()), source)
+        except Exception:
+            if time.monotonic() >= deadline:
+                raise requests.Timeout(f"Download exceeded {timeout} seconds")
+            raise
+        finally:
+            watchdog.cancel()
+
+        if time.monotonic() >= deadline:
+            raise requests.Timeout(f"Download exceeded {timeout} seconds")
+
+        feed['content_hash'] = digest.hexdigest()
+        feed['bookings'] = bookings
+        return feed
+
+
+def fetch_calendar_source(http, source, rate_limiter=None, force=False):
+    """Download the feed of a calendar source, conditionally unless force is set"""
+    if force:
+        return fetch_calendar_feed(http, source.source_url, source.source_name, rate_limiter)
+    return fetch_calendar_feed(http, source.source_url, source.source_name, rate_limiter,
+                               etag=source.etag, last_modified=source.last_modified)
+
+
+def apply_calendar_feed(source, feed, user_id=None, commit=True, force=False):
+    """
+    Process a downloaded feed for its calendar source and record its validators.
+    Returns the process_ics_bookings change report, or None if the feed is
+    unchanged since the last sync (HTTP 304 or identical content) and was not processed.
+    """
+    source.last_updated = datetime.utcnow()
+    source.etag = feed['etag']
+    source.last_modified = feed['last_modified']
+
+    unchanged = feed['not_modified'] or feed['content_hash'] == source.content_hash
+    if unchanged and not force:
+        result = None
+    else:
+        result = process_ics_bookings(feed['bookings'], source.unit_id, source.source_name,
+                                      user_id=user_id, commit=False)
+        if result['error']:
+            raise ValueError(result['error'])
+        source.content_hash = feed['content_hash']
+
+    if commit:
+        db.session.commit()
+    return result
+
+
+def sync_all_calendars():
+    """
+    Sync all calendar sources that have URLs.
+    Feeds are downloaded concurrently by a bounded thread pool; the results are
+    applied on this thread and committed in batches of CALENDAR_SYNC_BATCH_SIZE.
+    Returns a summary of the run.
+    """
+    summary = {'sources': 0, 'synced': 0, 'unchanged': 0, 'failed': 0, 'added': 0, 'updated': 0, 'cancelled': 0}
+
+    with app.app_context():
+        calendar_sources = CalendarSource.query.options(joinedload(CalendarSource.unit)).filter(
+            CalendarSource.source_url.isnot(None)).all()
+        summary['sources'] = len(calendar_sources)
+        if not calendar_sources:
+            return summary
+
+        # Imported bookings are recorded against a user of the unit's company
+        company_users = dict(db.session.query(User.company_id, func.min(User.id)).group_by(User.company_id).all())
+
+        rate_limiter = HostRateLimiter(CALENDAR_SYNC_HOST_INTERVAL)
+        pending = 0
+
+        with create_calendar_http_session() as http, \
+                ThreadPoolExecutor(max_workers=CALENDAR_SYNC_WORKERS) as executor:
+            # Worker threads only download; all database work stays on this thread
+            futures = {
+                executor.submit(fetch_calendar_feed, http, source.source_url, source.source_name, rate_limiter,
+                                etag=source.etag, last_modified=source.last_modified): source
+                for source in calendar_sources
+            }
+
+            for future in as_completed(futures):
+                source = futures[future]
+                try:
+                    feed = future.result()
+
+                    # Savepoint per source so one bad feed doesn't undo the rest of the batch
+                    with db.session.begin_nested():
+                        result = apply_calendar_feed(source, feed, user_id=company_users.get(source.unit.company_id),
+                                                     commit=False)
+
+                    if result is None:
+                        summary['unchanged'] += 1
+                    else:
+                        summary['synced'] += 1
+                        summary['added'] += len(result['added'])
+                        summary['updated'] += len(result['updated'])
+                        summary['cancelled'] += len(result['cancelled'])
+                    pending += 1
+                except Exception as e:
+                    summary['failed'] += 1
+                    print(f"Error syncing calendar for {source.unit.unit_number} from {source.source_name}: {str(e)}")
+
+                if pending >= CALENDAR_SYNC_BATCH_SIZE:
+                    db.session.commit()
+                    pending = 0
+
+        db.session.commit()
+
+    return summary
 
 
 from flask_apscheduler import APScheduler
@@ -2888,7 +3952,8 @@ def import_ics():
         # Check if it's a URL import or file upload
         import_type = request.form.get('import_type')
 
-        calendar_data = None
+        events = None
+        bookings = None
         source = request.form.get('booking_source', 'Airbnb')  # Default to Airbnb
 
         if import_type == 'url':
@@ -2899,13 +3964,12 @@ def import_ics():
                 return redirect(url_for('import_ics'))
 
             try:
-                # Download the ICS file
-                response = requests.get(ics_url)
-                if response.status_code != 200:
-                    flash(f'Error downloading ICS file: {response.status_code}', 'danger')
-                    return redirect(url_for('import_ics'))
-
-                calendar_data = response.text
+                # Download and parse the ICS file
+                with create_calendar_http_session(pool_size=1) as http:
+                    bookings = fetch_calendar_feed(http, ics_url, source)['bookings']
+            except requests.HTTPError as e:
+                flash(f'Error downloading ICS file: {e.response.status_code}', 'danger')
+                return redirect(url_for('import_ics'))
             except Exception as e:
                 flash(f'Error downloading ICS file: {str(e)}', 'danger')
                 return redirect(url_for('import_ics'))
@@ -2921,25 +3985,25 @@ def import_ics():
                 flash('No file selected', 'danger')
                 return redirect(url_for('import_ics'))
 
-            # Read the file contents
-            try:
-                calendar_data = file.read().decode('utf-8')
-            except UnicodeDecodeError:
-                # Try again without decoding if it's already binary
-                file.seek(0)
-                calendar_data = file.read()
-            except Exception as e:
-                flash(f'Error reading file: {str(e)}', 'danger')
-                return redirect(url_for('import_ics'))
+            # Read the file line by line while its bookings are processed
+            events = iter_ics_events(file.stream)
         else:
             flash('Invalid import type', 'danger')
             return redirect(url_for('import_ics'))
 
         # Process the ICS data
-        if calendar_data:
+        if events is not None or bookings is not None:
             try:
-                bookings_added, bookings_updated, bookings_cancelled = process_ics_calendar(calendar_data, unit_id,
-                                                                                            source)
+                if bookings is not None:
+                    report = process_ics_bookings(bookings, unit_id, source)
+                else:
+                    report = process_ics_calendar(events, unit_id, source)
+                if report['error']:
+                    flash(report['error'], 'danger')
+                    return redirect(url_for('import_ics'))
+                bookings_added = len(report['added'])
+                bookings_updated = len(report['updated'])
+                bookings_cancelled = len(report['cancelled'])
 
                 # Get the latest booking ID for highlighting (if any were added)
                 latest_booking = None
@@ -3004,19 +4068,22 @@ def refresh_calendar(source_id):
         flash('This calendar source does not have a URL for refreshing', 'danger')
         return redirect(url_for('import_ics'))
 
+    # ?force=1 downloads and processes the feed even if it looks unchanged
+    force = request.args.get('force') == '1'
+
     try:
-        # Download the ICS file
-        response = requests.get(calendar_source.source_url)
-        if response.status_code != 200:
-            flash(f'Error downloading ICS file: {response.status_code}', 'danger')
+        # Download the ICS file (conditionally, so unchanged feeds cost a 304)
+        with create_calendar_http_session(pool_size=1) as http:
+            feed = fetch_calendar_source(http, calendar_source, force=force)
+
+        # Process the calendar and update the last_updated timestamp
+        result = apply_calendar_feed(calendar_source, feed, force=force)
+        if result is None:
+            flash("Calendar synchronized: No changes detected", 'info')
             return redirect(url_for('import_ics'))
-
-        calendar_data = response.text
-
-        # Process the calendar
-        bookings_added, bookings_updated, bookings_cancelled = process_ics_calendar(calendar_data,
-                                                                                    calendar_source.unit_id,
-                                                                                    calendar_source.source_name)
+        bookings_added = len(result['added'])
+        bookings_updated = len(result['updated'])
+        bookings_cancelled = len(result['cancelled'])
 
         # Get the latest booking ID for highlighting (if any were added or updated)
         latest_booking = None
@@ -3024,10 +4091,6 @@ def refresh_calendar(source_id):
             latest_booking = BookingForm.query.filter_by(unit_id=calendar_source.unit_id).order_by(
                 BookingForm.date_added.desc()).first()
 
-        # Update the last_updated timestamp
-        calendar_source.last_updated = datetime.utcnow()
-        db.session.commit()
-
         message_parts = []
         if bookings_added > 0:
             message_parts.append(f"{bookings_added} bookings added")
@@ -3072,7 +4135,15 @@ def delete_calendar_source(source_id):
 
 # Add this helper function to parse dates in various formats
 def parse_date(date_str):
-    if not date_str or not date_str.strip():
+    """Date of an import value in one of several formats, or None (also for non-string values)"""
+    if not isinstance(date_str, str):
+        return None
+    return parse_date_text(date_str)
+
+
+@lru_cache(maxsize=4096)
+def parse_date_text(date_str):
+    if not date_str.strip():
         return None
 
     date_str = date_str.strip()
@@ -3112,7 +4183,6 @@ def parse_date(date_str):
     }
 
     # Check if it matches pattern like "Jan 3, 2025"
-    import re
     match = re.match(r'([a-zA-Z]+)\s+(\d{1,2}),\s+(\d{4})', date_str)
     if match:
         month_name, day, year = match.groups()
@@ -3124,10 +4194,212 @@ def parse_date(date_str):
                 pass
 
     # If all attempts fail, return None
-    print(f"Could not parse date: {date_str}")
     return None
 
 
+def parse_stay_date(date_str):
+    """Check-in/check-out date of an Airbnb export (YYYY-MM-DD or MM/DD/YYYY), or None"""
+    if not isinstance(date_str, str):
+        return None
+    return parse_stay_date_text(date_str)
+
+
+@lru_cache(maxsize=4096)
+def parse_stay_date_text(date_str):
+    date_str = date_str.strip()
+    try:
+        return date.fromisoformat(date_str)
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(date_str, '%m/%d/%Y').date()
+    except ValueError:
+        return None
+
+
+def parse_amount(value):
+    """Amount like "RM 1,234.50" as a Decimal of any size, or None if it isn't a number"""
+    if value is None:
+        return None
+    try:
+        amount = Decimal(str(value).upper().replace('RM', '').replace(',', '').strip())
+    except InvalidOperation:
+        return None
+    return amount if amount.is_finite() else None
+
+
+def parse_price(value):
+    """Amount of a price like "RM 1,234.50" as a Decimal, or None if it isn't a number or too large to store"""
+    price = parse_amount(value)
+    return price if price is not None and amount_in_range(price) else None
+
+
+def parse_guest_count(value):
+    """Guest count from an import row, or None if it is missing or not a number"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def find_import_unit(unit_number, units):
+    """
+    Match the listing of an import row to one of units ({unit_number.lower(): unit}):
+    exactly, else the first unit number contained in the listing or containing it.
+    """
+    if not unit_number:
+        return None
+    unit_number = unit_number.strip().lower()
+    if unit_number in units:
+        return units[unit_number]
+    for key, unit in units.items():
+        if key in unit_number or unit_number in key:
+            return unit
+    return None
+
+
+def import_airbnb_bookings(rows, company_id, user_id, first_row=1):
+    """
+    Create or update the company's bookings from rows of an Airbnb reservations export.
+    Each row is a dict with confirmation_code, guest_name, contact_number,
+    check_in_date, check_out_date, booking_date, price, payment_status, adults,
+    children, infants and unit_number (the listing).
+    Existing bookings are matched by confirmation code with one IN query and
+    updated with one bulk statement; unknown codes become new bookings of the
+    matching unit. Changes are flushed, not committed.
+    Returns a result per row: row number (counted from first_row), confirmation
+    code, status (created, updated, skipped or error) and a message.
+    """
+    rows = list(rows)
+    results = []
+
+    codes = {str(row.get('confirmation_code') or '').strip() for row in rows} - {''}
+    existing = {}
+    if codes:
+        existing = {booking.confirmation_code: booking for booking in db.session.query(
+            BookingForm.id,
+            BookingForm.confirmation_code,
+            BookingForm.guest_name,
+            BookingForm.contact_number,
+            BookingForm.check_in_date,
+            BookingForm.check_out_date,
+            BookingForm.number_of_nights,
+            BookingForm.booking_date,
+            BookingForm.price,
+            BookingForm.payment_status,
+            BookingForm.adults,
+            BookingForm.children,
+            BookingForm.infants
+        ).filter(
+            BookingForm.company_id == company_id,
+            BookingForm.confirmation_code.in_(codes)
+        )}
+
+    # Units are only needed to place new bookings
+    units = None
+    if codes - set(existing):
+        units = {unit.unit_number.lower(): unit for unit in db.session.query(
+            Unit.id, Unit.unit_number, Unit.building).filter(Unit.company_id == company_id)}
+
+    updates = []
+    inserts = []
+    seen_rows = {}
+
+    for row_number, row in enumerate(rows, start=first_row):
+        confirmation_code = str(row.get('confirmation_code') or '').strip()
+        result = {'row': row_number, 'confirmation_code': confirmation_code, 'status': 'error', 'message': ''}
+        results.append(result)
+
+        if not confirmation_code:
+            result['message'] = 'Missing confirmation code'
+            continue
+        if confirmation_code in seen_rows:
+            result['status'] = 'skipped'
+            result['message'] = f"Duplicate of row {seen_rows[confirmation_code]}"
+            continue
+        seen_rows[confirmation_code] = row_number
+
+        check_in_date = parse_stay_date(row.get('check_in_date'))
+        check_out_date = parse_stay_date(row.get('check_out_date'))
+        valid_dates = check_in_date and check_out_date and check_in_date < check_out_date
+        booking_date = parse_date(row.get('booking_date')) if row.get('booking_date') else None
+        price = parse_price(row.get('price'))
+        guests = {field: parse_guest_count(row.get(field)) for field in ('adults', 'children', 'infants')}
+
+        booking = existing.get(confirmation_code)
+        if booking:
+            # Only update fields that are present in the export
+            values = {
+                'id': booking.id,
+                'guest_name': row.get('guest_name') or booking.guest_name,
+                'contact_number': row.get('contact_number') or booking.contact_number,
+                'check_in_date': check_in_date if valid_dates else booking.check_in_date,
+                'check_out_date': check_out_date if valid_dates else booking.check_out_date,
+                'number_of_nights': (check_out_date - check_in_date).days if valid_dates else booking.number_of_nights,
+                'booking_date': booking_date or booking.booking_date,
+                'price': price if price and price > 0 else booking.price,
+                'payment_status': row.get('payment_status') or booking.payment_status
+            }
+            for field, count in guests.items():
+                values[field] = count if count and count > 0 else getattr(booking, field)
+            values['number_of_guests'] = (values['adults'] or 0) + (values['children'] or 0) + (values['infants'] or 0)
+            updates.append(values)
+            result['status'] = 'updated'
+            result['message'] = 'Booking updated' if valid_dates else 'Booking updated, dates kept (invalid dates in row)'
+            continue
+
+        # New booking, but first we need to find the correct unit
+        unit = find_import_unit(row.get('unit_number'), units)
+        if not unit:
+            result['message'] = f"No unit matches listing '{row.get('unit_number') or ''}'"
+            continue
+        if not valid_dates:
+            result['message'] = 'Invalid check-in/check-out dates'
+            continue
+
+        inserts.append({
+            'guest_name': row.get('guest_name') or 'Airbnb Guest',
+            'contact_number': row.get('contact_number') or '-',
+            'check_in_date': check_in_date,
+            'check_out_date': check_out_date,
+            'property_name': unit.building or "Property",
+            'unit_id': unit.id,
+            'number_of_nights': (check_out_date - check_in_date).days,
+            'number_of_guests': sum(count or 0 for count in guests.values()),
+            'price': price or 0,
+            'booking_source': 'Airbnb',
+            'payment_status': row.get('payment_status') or 'Pending',
+            'notes': "Imported from Airbnb CSV",
+            'confirmation_code': confirmation_code,
+            'booking_date': booking_date,
+            'adults': guests['adults'],
+            'children': guests['children'],
+            'infants': guests['infants'],
+            'company_id': company_id,
+            'user_id': user_id
+        })
+        result['status'] = 'created'
+        result['message'] = f"Booking created for unit {unit.unit_number}"
+
+    changed_ids = [values['id'] for values in updates]
+    if updates:
+        db.session.execute(update(BookingForm), updates)
+    if inserts:
+        changed_ids += db.session.execute(insert(BookingForm).returning(BookingForm.id), inserts).scalars().all()
+    refresh_unit_nights(changed_ids)
+    db.session.flush()
+
+    return results
+
+
+def summarize_import_results(results):
+    """Counts of import results by status"""
+    counts = {'created': 0, 'updated': 0, 'skipped': 0, 'errors': 0}
+    for result in results:
+        counts['errors' if result['status'] == 'error' else result['status']] += 1
+    return counts
+
+
 # Add this endpoint to app.py
 @app.route('/api/import_airbnb_csv', methods=['POST'])
 @login_required
@@ -3143,197 +4415,100 @@ def import_airbnb_csv():
     if not bookings:
         return jsonify({'success': False, 'message': 'No booking data provided.'}), 400
 
-    # Get the user's company ID
-    company_id = current_user.company_id
+    try:
+        results = import_airbnb_bookings(bookings, current_user.company_id, current_user.id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error importing Airbnb bookings: {e}")
+        return jsonify({'success': False, 'message': f'Error importing bookings: {str(e)}'}), 500
 
-    # Counters for tracking what happened
-    created_count = 0
-    updated_count = 0
-    error_count = 0
+    counts = summarize_import_results(results)
 
-    for booking_data in bookings:
-        try:
-            # Check if confirmation code exists
-            confirmation_code = booking_data.get('confirmation_code')
-            if not confirmation_code:
-                error_count += 1
-                continue
+    # Return the result
+    return jsonify({
+        'success': True,
+        'message': f"Successfully processed {len(results)} bookings. Created: {counts['created']}, "
+                   f"Updated: {counts['updated']}, Skipped: {counts['skipped']}, Errors: {counts['errors']}",
+        'created': counts['created'],
+        'updated': counts['updated'],
+        'skipped': counts['skipped'],
+        'errors': counts['errors'],
+        'results': results
+    })
 
-            # Check if we already have this booking in our database
-            existing_booking = BookingForm.query.filter_by(
-                confirmation_code=confirmation_code,
-                company_id=company_id
-            ).first()
 
-            # If booking exists, update it with new information
-            if existing_booking:
-                # Convert date strings to date objects
-                try:
-                    check_in_date = datetime.strptime(booking_data.get('check_in_date', ''), '%Y-%m-%d').date()
-                    check_out_date = datetime.strptime(booking_data.get('check_out_date', ''), '%Y-%m-%d').date()
-                except (ValueError, TypeError):
-                    # Try different date format (like MM/DD/YYYY)
-                    try:
-                        check_in_date = datetime.strptime(booking_data.get('check_in_date', ''), '%m/%d/%Y').date()
-                        check_out_date = datetime.strptime(booking_data.get('check_out_date', ''), '%m/%d/%Y').date()
-                    except (ValueError, TypeError):
-                        # Keep existing dates if parsing fails
-                        check_in_date = existing_booking.check_in_date
-                        check_out_date = existing_booking.check_out_date
-
-                # Try to parse booking date
-                booking_date = None
-                # Update booking date if provided
-                if booking_data.get('booking_date'):
-                    parsed_date = parse_date(booking_data.get('booking_date'))
-                    if parsed_date:
-                        existing_booking.booking_date = parsed_date
-
-                # Only update fields if they exist in the CSV
-                if booking_data.get('guest_name'):
-                    existing_booking.guest_name = booking_data.get('guest_name')
-                if booking_data.get('contact_number'):
-                    existing_booking.contact_number = booking_data.get('contact_number')
-
-                # Update dates only if valid
-                if check_in_date and check_out_date and check_in_date < check_out_date:
-                    existing_booking.check_in_date = check_in_date
-                    existing_booking.check_out_date = check_out_date
-                    # Calculate nights from the dates
-                    existing_booking.number_of_nights = (check_out_date - check_in_date).days
-
-                # Update booking_date if parsed successfully
-                if booking_date:
-                    existing_booking.booking_date = booking_date
-
-                # Update other fields
-                # Update other fields
-                if booking_data.get('price'):
-                    try:
-                        # Handle price as string, removing any non-numeric characters except periods
-                        price_str = str(booking_data.get('price'))
-                        # Remove any remaining 'RM' if it wasn't caught by JavaScript
-                        price_str = price_str.replace('RM', '').replace(',', '').strip()
-                        price_value = float(price_str)
-
-                        if price_value > 0:
-                            existing_booking.price = price_value
-                            print(f"Updated price to: {price_value}")
-                    except (ValueError, TypeError) as e:
-                        print(f"Failed to convert price: {booking_data.get('price')} - Error: {e}")
-
-                if booking_data.get('payment_status'):
-                    existing_booking.payment_status = booking_data.get('payment_status')
-
-                # Update guest counts
-                if 'adults' in booking_data and booking_data['adults'] > 0:
-                    existing_booking.adults = booking_data['adults']
-                if 'children' in booking_data and booking_data['children'] > 0:
-                    existing_booking.children = booking_data['children']
-                if 'infants' in booking_data and booking_data['infants'] > 0:
-                    existing_booking.infants = booking_data['infants']
-
-                # Update total number of guests
-                existing_booking.number_of_guests = (
-                        (existing_booking.adults or 0) +
-                        (existing_booking.children or 0) +
-                        (existing_booking.infants or 0)
-                )
+# Rows of an uploaded Airbnb export applied (and committed) per transaction
+AIRBNB_IMPORT_CHUNK_SIZE = int(os.environ.get('AIRBNB_IMPORT_CHUNK_SIZE', 500))
 
-                updated_count += 1
-            else:
-                # This is a new booking - we would normally create it, but
-                # in this case we'll skip it since we want to focus on updating existing bookings
-                # If you decide you want to create new bookings too, uncomment this block
-                """
-                # New booking, but first we need to find the correct unit_id
-                unit = None
-                if booking_data.get('unit_number'):
-                    unit = Unit.query.filter_by(
-                        unit_number=booking_data.get('unit_number'),
-                        company_id=company_id
-                    ).first()
-
-                if not unit:
-                    # Skip if we can't find the unit
-                    error_count += 1
-                    continue
-
-                # Convert date strings to date objects
-                try:
-                    check_in_date = datetime.strptime(booking_data.get('check_in_date', ''), '%Y-%m-%d').date()
-                    check_out_date = datetime.strptime(booking_data.get('check_out_date', ''), '%Y-%m-%d').date()
-                    nights = (check_out_date - check_in_date).days
-                except (ValueError, TypeError):
-                    # Try different date format
-                    try:
-                        check_in_date = datetime.strptime(booking_data.get('check_in_date', ''), '%m/%d/%Y').date()
-                        check_out_date = datetime.strptime(booking_data.get('check_out_date', ''), '%m/%d/%Y').date()
-                        nights = (check_out_date - check_in_date).days
-                    except (ValueError, TypeError):
-                        error_count += 1
-                        continue
-
-                # Parse booking date
-                # Try to parse booking date - using the correct YYYY-MM-DD format
-                booking_date = None
-                if booking_data.get('booking_date'):
-                    try:
-                        # Parse in YYYY-MM-DD format
-                        booking_date = datetime.strptime(booking_data.get('booking_date'), '%Y-%m-%d').date()
-                    except (ValueError, TypeError) as e:
-                        print(f"Error parsing booking date '{booking_data.get('booking_date')}': {e}")
-                        # Keep the existing booking date if parsing fails
-                        booking_date = existing_booking.booking_date
-
-                # Create new booking
-                new_booking = BookingForm(
-                    guest_name=booking_data.get('guest_name', 'Airbnb Guest'),
-                    contact_number=booking_data.get('contact_number', '-'),
-                    check_in_date=check_in_date,
-                    check_out_date=check_out_date,
-                    property_name=unit.building or "Property",
-                    unit_id=unit.id,
-                    number_of_nights=nights,
-                    number_of_guests=(
-                        (booking_data.get('adults') or 0) + 
-                        (booking_data.get('children') or 0) + 
-                        (booking_data.get('infants') or 0)
-                    ),
-                    price=booking_data.get('price', '0.00'),
-                    booking_source='Airbnb',
-                    payment_status=booking_data.get('payment_status', 'Pending'),
-                    notes=f"Imported from Airbnb CSV",
-                    confirmation_code=confirmation_code,
-                    booking_date=booking_date,
-                    adults=booking_data.get('adults'),
-                    children=booking_data.get('children'),
-                    infants=booking_data.get('infants'),
-                    company_id=company_id,
-                    user_id=current_user.id
-                )
+# Airbnb reservations export column -> import_airbnb_bookings() field
+AIRBNB_CSV_COLUMNS = {
+    'Confirmation code': 'confirmation_code',
+    'Status': 'payment_status',
+    'Guest name': 'guest_name',
+    'Contact': 'contact_number',
+    '# of adults': 'adults',
+    '# of children': 'children',
+    '# of infants': 'infants',
+    'Start date': 'check_in_date',
+    'End date': 'check_out_date',
+    'Booked': 'booking_date',
+    'Listing': 'unit_number',
+    'Earnings': 'price'
+}
 
-                db.session.add(new_booking)
-                created_count += 1
-                """
 
-                # Skip creating new bookings
-                pass
+def read_airbnb_csv(stream):
+    """Yield the rows of an Airbnb reservations export one at a time, as import_airbnb_bookings() fields"""
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline=''))
+    for row in reader:
+        yield {field: (row.get(column) or '').strip() for column, field in AIRBNB_CSV_COLUMNS.items()}
 
-        except Exception as e:
-            error_count += 1
-            print(f"Error processing booking: {e}")
 
-    # Commit all changes
-    db.session.commit()
-
-    # Return the result
+@app.route('/api/import_airbnb_csv/upload', methods=['POST'])
+@login_required
+@permission_required('can_manage_bookings')
+def upload_airbnb_csv():
+    """Import an uploaded Airbnb reservations CSV, parsed as it is read and committed in chunks"""
+    file = request.files.get('csv_file')
+    if not file or file.filename == '':
+        return jsonify({'success': False, 'message': 'No CSV file provided.'}), 400
+
+    rows = read_airbnb_csv(file.stream)
+    results = []
+    try:
+        while True:
+            chunk = list(islice(rows, AIRBNB_IMPORT_CHUNK_SIZE))
+            if not chunk:
+                break
+            first_row = len(results) + 1
+            try:
+                results.extend(import_airbnb_bookings(chunk, current_user.company_id, current_user.id,
+                                                      first_row=first_row))
+                db.session.commit()
+            except Exception as e:
+                # Earlier chunks stay committed; report this chunk's rows as failed
+                db.session.rollback()
+                print(f"Error importing Airbnb bookings: {e}")
+                results.extend([{'row': row_number,
+                                 'confirmation_code': row['confirmation_code'],
+                                 'status': 'error',
+                                 'message': f'Error importing bookings: {str(e)}'}
+                                for row_number, row in enumerate(chunk, start=first_row)])
+    except csv.Error as e:
+        return jsonify({'success': False, 'message': f'Error reading CSV file: {str(e)}',
+                        'results': results, **summarize_import_results(results)}), 400
+
+    if not results:
+        return jsonify({'success': False, 'message': 'No booking data found in the CSV file.'}), 400
+
+    counts = summarize_import_results(results)
     return jsonify({
         'success': True,
-        'message': f"Successfully processed {updated_count} bookings. Updated: {updated_count}, Errors: {error_count}",
-        'updated': updated_count,
-        'created': created_count,
-        'errors': error_count
+        'message': f"Successfully processed {len(results)} bookings. Created: {counts['created']}, "
+                   f"Updated: {counts['updated']}, Skipped: {counts['skipped']}, Errors: {counts['errors']}",
+        **counts,
+        'results': results
     })
 
 
@@ -3507,6 +4682,81 @@ def expenses():
     return render_template('expenses.html', current_month=current_month, buildings=buildings)
 
 
+# Money columns of ExpenseData: sales (revenue) followed by the expense categories
+EXPENSE_FIELDS = ['sales', 'rental', 'electricity', 'water', 'sewage', 'internet', 'cleaner', 'laundry', 'supplies',
+                  'repair', 'replace', 'other']
+
+
+def get_expense_totals(company_id, year, month=None, building=None):
+    """Portfolio totals of each expense field for a year (or one month of it), summed in SQL"""
+    query = db.session.query(
+        *[func.coalesce(func.sum(getattr(ExpenseData, field)), 0).label(field) for field in EXPENSE_FIELDS]
+    ).filter(
+        ExpenseData.company_id == company_id,
+        ExpenseData.year == year
+    )
+    if month:
+        query = query.filter(ExpenseData.month == month)
+    if building and building != 'all':
+        query = query.join(Unit, Unit.id == ExpenseData.unit_id).filter(Unit.building == building)
+
+    totals = query.one()
+    return {field: float(getattr(totals, field)) for field in EXPENSE_FIELDS}
+
+
+def upsert_expense_rows(rows):
+    """
+    Insert or update ExpenseData rows in bulk. Each row is a dict with company_id,
+    unit_id, year, month and the EXPENSE_FIELDS amounts. Uses the database's
+    native upsert on unique_unit_expense_monthly where there is one.
+    """
+    if not rows:
+        return
+
+    now = datetime.utcnow()
+    rows = [dict(row, updated_at=now) for row in rows]
+    table = ExpenseData.__table__
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        stmt = (postgresql if dialect == 'postgresql' else sqlite).insert(table)
+        conflict = {'constraint': 'unique_unit_expense_monthly'} if dialect == 'postgresql' else {
+            'index_elements': ['company_id', 'unit_id', 'year', 'month']}
+        stmt = stmt.on_conflict_do_update(
+            set_={field: stmt.excluded[field] for field in EXPENSE_FIELDS + ['updated_at']}, **conflict)
+        db.session.execute(stmt, rows)
+        return
+
+    if dialect in ('mysql', 'mariadb'):
+        stmt = mysql.insert(table)
+        stmt = stmt.on_duplicate_key_update({field: stmt.inserted[field] for field in EXPENSE_FIELDS + ['updated_at']})
+        db.session.execute(stmt, rows)
+        return
+
+    # Other databases: find the existing rows with one query per month, then bulk update and insert
+    existing = {}
+    for year, month in {(row['year'], row['month']) for row in rows}:
+        existing.update(((year, month, unit_id), expense_id) for expense_id, unit_id in db.session.query(
+            ExpenseData.id, ExpenseData.unit_id).filter(
+            ExpenseData.company_id.in_({row['company_id'] for row in rows}),
+            ExpenseData.year == year,
+            ExpenseData.month == month,
+            ExpenseData.unit_id.in_({row['unit_id'] for row in rows})))
+
+    updates = []
+    inserts = []
+    for row in rows:
+        expense_id = existing.get((row['year'], row['month'], row['unit_id']))
+        if expense_id:
+            updates.append(dict({field: row[field] for field in EXPENSE_FIELDS}, id=expense_id, updated_at=now))
+        else:
+            inserts.append(row)
+    if updates:
+        db.session.execute(update(ExpenseData), updates)
+    if inserts:
+        db.session.execute(insert(ExpenseData), inserts)
+
+
 # API endpoint to get expense data
 @app.route('/api/expenses', methods=['GET'])
 @login_required
@@ -3535,26 +4785,16 @@ def get_expenses():
         month=month
     ).all()
 
-    # Format expense data
+    # Format expense data (amounts as strings, empty when not entered)
     for expense in expenses:
         expenses_data[expense.unit_id] = {
-            'sales': expense.sales,
-            'rental': expense.rental,
-            'electricity': expense.electricity,
-            'water': expense.water,
-            'sewage': expense.sewage,
-            'internet': expense.internet,
-            'cleaner': expense.cleaner,
-            'laundry': expense.laundry,
-            'supplies': expense.supplies,
-            'repair': expense.repair,
-            'replace': expense.replace,
-            'other': expense.other
+            field: '' if getattr(expense, field) is None else str(getattr(expense, field)) for field in EXPENSE_FIELDS
         }
 
     return jsonify({
         'units': units_data,
-        'expenses': expenses_data
+        'expenses': expenses_data,
+        'totals': get_expense_totals(company_id, year, month=month)
     })
 
 
@@ -3568,64 +4808,35 @@ def save_expenses():
     if not data or 'year' not in data or 'month' not in data or 'expenses' not in data:
         return jsonify({'error': 'Invalid data format'}), 400
 
-    year = data['year']
-    month = data['month']
-    expenses_data = data['expenses']
+    try:
+        year = int(data['year'])
+        month = int(data['month'])
+        # Convert unit ids to integers (they are strings in JSON)
+        expenses_data = {int(unit_id): expense for unit_id, expense in data['expenses'].items()}
+    except (TypeError, ValueError, AttributeError):
+        return jsonify({'error': 'Invalid data format'}), 400
     company_id = current_user.company_id
 
-    # Process each unit's expense data
-    for unit_id, expense in expenses_data.items():
-        # Convert unit_id to integer (it might be a string in JSON)
-        unit_id = int(unit_id)
+    # Only keep units that belong to the company, checked with one query
+    company_unit_ids = set()
+    if expenses_data:
+        company_unit_ids = {unit_id for (unit_id,) in db.session.query(Unit.id).filter(
+            Unit.company_id == company_id, Unit.id.in_(expenses_data))}
+
+    # Amounts arrive as entered ("1,200", "RM 50"); empty or invalid ones are stored as NULL
+    rows = [
+        dict(company_id=company_id, unit_id=unit_id, year=year, month=month,
+             **{field: parse_amount(expense.get(field)) for field in EXPENSE_FIELDS})
+        for unit_id, expense in expenses_data.items() if unit_id in company_unit_ids
+    ]
 
-        # Check if unit belongs to the company
-        unit = Unit.query.filter_by(id=unit_id, company_id=company_id).first()
-        if not unit:
-            continue  # Skip if unit doesn't belong to the company
+    # Amounts too large for the columns are rejected rather than dropped
+    out_of_range = [f"unit {row['unit_id']} {field}" for row in rows for field in EXPENSE_FIELDS
+                    if row[field] is not None and not amount_in_range(row[field])]
+    if out_of_range:
+        return jsonify({'error': f"Amounts must be at most {MAX_AMOUNT:,}: {', '.join(out_of_range)}"}), 400
 
-        # Check if expense record already exists
-        existing_expense = ExpenseData.query.filter_by(
-            company_id=company_id,
-            unit_id=unit_id,
-            year=year,
-            month=month
-        ).first()
-
-        if existing_expense:
-            # Update existing record
-            existing_expense.sales = expense.get('sales', '')
-            existing_expense.rental = expense.get('rental', '')
-            existing_expense.electricity = expense.get('electricity', '')
-            existing_expense.water = expense.get('water', '')
-            existing_expense.sewage = expense.get('sewage', '')
-            existing_expense.internet = expense.get('internet', '')
-            existing_expense.cleaner = expense.get('cleaner', '')
-            existing_expense.laundry = expense.get('laundry', '')
-            existing_expense.supplies = expense.get('supplies', '')
-            existing_expense.repair = expense.get('repair', '')
-            existing_expense.replace = expense.get('replace', '')
-            existing_expense.other = expense.get('other', '')
-        else:
-            # Create new record
-            new_expense = ExpenseData(
-                company_id=company_id,
-                unit_id=unit_id,
-                year=year,
-                month=month,
-                sales=expense.get('sales', ''),
-                rental=expense.get('rental', ''),
-                electricity=expense.get('electricity', ''),
-                water=expense.get('water', ''),
-                sewage=expense.get('sewage', ''),
-                internet=expense.get('internet', ''),
-                cleaner=expense.get('cleaner', ''),
-                laundry=expense.get('laundry', ''),
-                supplies=expense.get('supplies', ''),
-                repair=expense.get('repair', ''),
-                replace=expense.get('replace', ''),
-                other=expense.get('other', '')
-            )
-            db.session.add(new_expense)
+    upsert_expense_rows(rows)
 
     # Commit all changes
     db.session.commit()
@@ -3633,70 +4844,178 @@ def save_expenses():
     return jsonify({'success': True, 'message': 'Expenses data saved successfully'})
 
 
+def month_bounds(year, month):
+    """First day of the month and first day of the next month"""
+    start_date = date(year, month, 1)
+    end_date = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start_date, end_date
+
+
+def get_unit_revenue_by_month(company_id, months):
+    """
+    Booking revenue of each unit for each (year, month) in months, prorated by the
+    nights that fall in the month. One grouped SUM over the unit_night ledger,
+    which already holds each booking's price split over its nights.
+    Returns {(year, month): {unit_id: revenue}}.
+    """
+    months = sorted(set(months))
+    revenues = {key: {} for key in months}
+    if not months:
+        return revenues
+
+    # The requested months as a derived table of (month_start, month_end)
+    month_rows = [select(literal(start, Date).label('month_start'), literal(end, Date).label('month_end'))
+                  for start, end in (month_bounds(year, month) for year, month in months)]
+    month_table = (union_all(*month_rows) if len(month_rows) > 1 else month_rows[0]).subquery('months')
+
+    rows = db.session.query(
+        month_table.c.month_start,
+        UnitNight.unit_id,
+        func.sum(UnitNight.revenue)
+    ).join(
+        month_table,
+        and_(UnitNight.night >= month_table.c.month_start, UnitNight.night < month_table.c.month_end)
+    ).filter(
+        UnitNight.company_id == company_id
+    ).group_by(month_table.c.month_start, UnitNight.unit_id)
+
+    for month_start, unit_id, revenue in rows:
+        if isinstance(month_start, str):
+            month_start = date.fromisoformat(month_start)
+        revenues[(month_start.year, month_start.month)][unit_id] = round(float(revenue or 0), 2)
+    return revenues
+
+
+def get_monthly_unit_revenue(company_id, year, month):
+    """Booking revenue of each unit for a month, prorated by the nights that fall in it"""
+    return get_unit_revenue_by_month(company_id, [(year, month)])[(year, month)]
+
+
+# Longest from/to range of the monthly revenue API
+MONTHLY_REVENUE_MAX_MONTHS = 36
+
+
 @app.route('/api/bookings/monthly_revenue')
 @login_required
 def get_monthly_revenue():
+    """
+    Prorated booking revenue per unit. With year and month, for that month:
+    {'revenues': {unit_id: revenue}}. With only a year, or with from/to
+    (YYYY-MM, at most MONTHLY_REVENUE_MAX_MONTHS months), for every month of the range in one query:
+    {'months': {'YYYY-MM': {unit_id: revenue}}}.
+    """
     # Get query parameters
     year = request.args.get('year', type=int)
     month = request.args.get('month', type=int)
+    range_from = request.args.get('from')
+    range_to = request.args.get('to')
 
-    if not year or not month:
+    if year and month:
+        revenues = get_monthly_unit_revenue(current_user.company_id, year, month)
+        return jsonify({'revenues': revenues})
+
+    try:
+        if range_from and range_to:
+            first = datetime.strptime(range_from, '%Y-%m').date()
+            last = datetime.strptime(range_to, '%Y-%m').date()
+        elif year:
+            first, last = date(year, 1, 1), date(year, 12, 1)
+        else:
+            raise ValueError
+    except ValueError:
         return jsonify({'error': 'Year and month parameters are required'}), 400
 
-    # Get the company ID for the current user
-    company_id = current_user.company_id
+    month_count = (last.year - first.year) * 12 + last.month - first.month + 1
+    if month_count <= 0:
+        return jsonify({'error': 'from must not be after to'}), 400
+    if month_count > MONTHLY_REVENUE_MAX_MONTHS:
+        return jsonify({'error': f'At most {MONTHLY_REVENUE_MAX_MONTHS} months'}), 400
 
-    # Set date range for the specified month
-    start_date = datetime(year, month, 1).date()
-    if month == 12:
-        end_date = datetime(year + 1, 1, 1).date()
-    else:
-        end_date = datetime(year, month + 1, 1).date()
+    months = []
+    current = (first.year, first.month)
+    while current <= (last.year, last.month):
+        months.append(current)
+        current = (current[0] + 1, 1) if current[1] == 12 else (current[0], current[1] + 1)
 
-    # Query bookings for the month that either:
-    # 1. Have check-in date during the specified month
-    # 2. Have check-out date during the specified month
-    # 3. Span the entire month (check-in before the month, check-out after the month)
-    bookings = BookingForm.query.filter(
-        BookingForm.company_id == company_id,
-        (
-            # Check-in during the month
-                (BookingForm.check_in_date >= start_date) & (BookingForm.check_in_date < end_date) |
-                # Check-out during the month
-                (BookingForm.check_out_date > start_date) & (BookingForm.check_out_date <= end_date) |
-                # Spanning the entire month
-                (BookingForm.check_in_date <= start_date) & (BookingForm.check_out_date >= end_date)
-        )
-    ).all()
+    revenues = get_unit_revenue_by_month(current_user.company_id, months)
+    return jsonify({'months': {f"{key[0]}-{key[1]:02d}": value for key, value in revenues.items()}})
 
-    # Calculate revenue per unit
-    revenues = {}
-    for booking in bookings:
-        unit_id = booking.unit_id
-        if unit_id not in revenues:
-            revenues[unit_id] = 0
 
-        # Calculate the portion of booking revenue to attribute to this month
-        total_nights = (booking.check_out_date - booking.check_in_date).days
-        if total_nights <= 0:
-            continue
+def get_occupancy_stats(company_id, start_date, end_date, building=None):
+    """
+    Occupancy rate, ADR (revenue per occupied night) and RevPAR (revenue per
+    available night) of a company's units for the nights from start_date up to,
+    not including, end_date. One indexed SUM over the unit_night ledger, grouped
+    by unit. Returns {'units': {unit_id: stats}, 'total': stats}.
+    """
+    units_query = db.session.query(Unit.id).filter(Unit.company_id == company_id)
+    if building:
+        units_query = units_query.filter(Unit.building == building)
+    unit_ids = [unit_id for (unit_id,) in units_query]
+    days = max((end_date - start_date).days, 0)
+
+    nights_query = db.session.query(
+        UnitNight.unit_id,
+        # Overlapping bookings of a unit still make one occupied night
+        func.count(func.distinct(UnitNight.night)),
+        func.sum(UnitNight.revenue)
+    ).filter(
+        UnitNight.company_id == company_id,
+        UnitNight.night >= start_date,
+        UnitNight.night < end_date
+    )
+    if building:
+        nights_query = nights_query.filter(UnitNight.unit_id.in_(unit_ids))
+    booked = {unit_id: (nights, revenue) for unit_id, nights, revenue in nights_query.group_by(UnitNight.unit_id)}
+
+    def occupancy(occupied, available, revenue):
+        return {
+            'occupied_nights': occupied,
+            'available_nights': available,
+            'revenue': round(revenue, 2),
+            'occupancy_rate': round(occupied / available * 100, 1) if available else 0,
+            'adr': round(revenue / occupied, 2) if occupied else 0,
+            'revpar': round(revenue / available, 2) if available else 0
+        }
 
-        # Determine the nights that fall within the selected month
-        night_start = max(booking.check_in_date, start_date)
-        night_end = min(booking.check_out_date, end_date)
-        nights_in_month = (night_end - night_start).days
+    units = {}
+    for unit_id in unit_ids:
+        nights, revenue = booked.get(unit_id, (0, 0))
+        units[unit_id] = occupancy(nights, days, float(revenue or 0))
 
-        # Calculate prorated revenue for the month
-        if total_nights > 0 and booking.price:
-            try:
-                daily_rate = float(booking.price) / total_nights
-                month_revenue = daily_rate * nights_in_month
-                revenues[unit_id] += month_revenue
-            except (ValueError, TypeError):
-                # Handle any conversion errors
-                pass
+    total_nights = sum(stats['occupied_nights'] for stats in units.values())
+    total_revenue = sum(float(revenue or 0) for nights, revenue in booked.values())
+    return {'units': units, 'total': occupancy(total_nights, days * len(unit_ids), total_revenue)}
 
-    return jsonify({'revenues': revenues})
+
+@app.route('/api/bookings/occupancy')
+@login_required
+@permission_required('can_view_bookings')
+def get_booking_occupancy():
+    """
+    Occupancy rate, ADR and RevPAR per unit and overall for the nights from
+    start up to, not including, end (YYYY-MM-DD, default the current month),
+    optionally only for one building.
+    """
+    try:
+        if request.args.get('start') and request.args.get('end'):
+            start_date = datetime.strptime(request.args['start'], '%Y-%m-%d').date()
+            end_date = datetime.strptime(request.args['end'], '%Y-%m-%d').date()
+        else:
+            today = datetime.now().date()
+            start_date, end_date = month_bounds(today.year, today.month)
+    except ValueError:
+        return jsonify({'error': 'start and end must be dates in YYYY-MM-DD format'}), 400
+
+    if end_date <= start_date:
+        return jsonify({'error': 'end must be after start'}), 400
+
+    stats = get_occupancy_stats(current_user.company_id, start_date, end_date, request.args.get('building'))
+    return jsonify({
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        **stats
+    })
 
 
 @app.route('/api/issues/monthly_costs')
@@ -3731,14 +5050,14 @@ def get_monthly_issue_costs():
     # Filter by type if specified
     if issue_type == 'repair':
         # Join with Type model to filter for "Repair" type
-        repair_type = Type.query.filter_by(name='Repair').first()
-        if repair_type:
-            query = query.filter(Issue.type_id == repair_type.id)
+        repair_type_id = lookup_ids(Type).get('Repair')
+        if repair_type_id:
+            query = query.filter(Issue.type_id == repair_type_id)
     elif issue_type == 'replace':
         # Join with Type model to filter for "Replace" type
-        replace_type = Type.query.filter_by(name='Replace').first()
-        if replace_type:
-            query = query.filter(Issue.type_id == replace_type.id)
+        replace_type_id = lookup_ids(Type).get('Replace')
+        if replace_type_id:
+            query = query.filter(Issue.type_id == replace_type_id)
 
     # Get the issues
     issues = query.all()
@@ -3760,6 +5079,90 @@ def get_monthly_issue_costs():
     return jsonify({'costs': costs})
 
 
+def get_monthly_issue_costs_by_type(company_id, year, month):
+    """Repair and Replace issue costs of each unit for a month, summed in one grouped query"""
+    start_date = datetime(year, month, 1)
+    end_date = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+
+    rows = db.session.query(
+        Issue.unit_id,
+        Type.name,
+        func.sum(Issue.cost)
+    ).join(
+        Type, Issue.type_id == Type.id
+    ).filter(
+        Issue.company_id == company_id,
+        Issue.date_added >= start_date,
+        Issue.date_added < end_date,
+        Issue.cost.isnot(None),
+        Type.name.in_(['Repair', 'Replace'])
+    ).group_by(Issue.unit_id, Type.name)
+
+    costs = {'repair': {}, 'replace': {}}
+    for unit_id, type_name, cost in rows:
+        costs[type_name.lower()][unit_id] = float(cost or 0)
+    return costs
+
+
+@app.route('/api/expenses/month_view', methods=['GET'])
+@login_required
+def get_expenses_month_view():
+    """
+    Everything the expenses sheet needs for one month: units, stored expenses of
+    the month and the previous month, prorated booking revenue and repair/replace
+    issue costs. Served with an ETag so unchanged months revalidate with a 304.
+    """
+    year = request.args.get('year', type=int)
+    month = request.args.get('month', type=int)
+
+    if not year or not month or not 1 <= month <= 12:
+        return jsonify({'error': 'Year and month parameters are required'}), 400
+
+    company_id = current_user.company_id
+    prev_year, prev_month = (year - 1, 12) if month == 1 else (year, month - 1)
+
+    units = db.session.query(Unit.id, Unit.unit_number, Unit.building).filter(
+        Unit.company_id == company_id).order_by(Unit.id)
+    units_data = [{'id': unit.id, 'unit_number': unit.unit_number, 'building': unit.building} for unit in units]
+
+    # Both months' expense rows in one query
+    expenses_data = {}
+    previous_expenses_data = {}
+    expense_rows = db.session.query(
+        ExpenseData.unit_id,
+        ExpenseData.year,
+        ExpenseData.month,
+        *[getattr(ExpenseData, field) for field in EXPENSE_FIELDS]
+    ).filter(
+        ExpenseData.company_id == company_id,
+        or_(and_(ExpenseData.year == year, ExpenseData.month == month),
+            and_(ExpenseData.year == prev_year, ExpenseData.month == prev_month))
+    )
+    for row in expense_rows:
+        target = expenses_data if (row.year, row.month) == (year, month) else previous_expenses_data
+        # Amounts as strings, empty when not entered (same format as /api/expenses)
+        target[row.unit_id] = {
+            field: '' if getattr(row, field) is None else str(getattr(row, field)) for field in EXPENSE_FIELDS
+        }
+
+    issue_costs = get_monthly_issue_costs_by_type(company_id, year, month)
+
+    response = jsonify({
+        'year': year,
+        'month': month,
+        'units': units_data,
+        'expenses': expenses_data,
+        'previous_expenses': previous_expenses_data,
+        'revenues': get_monthly_unit_revenue(company_id, year, month),
+        'repair_costs': issue_costs['repair'],
+        'replace_costs': issue_costs['replace']
+    })
+    # Browsers must revalidate every time, but an unchanged month costs only a 304
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
+
+
 @app.route('/api/expenses/yearly', methods=['GET'])
 @login_required
 def get_yearly_expenses():
@@ -3773,69 +5176,40 @@ def get_yearly_expenses():
     # Get the company ID for the current user
     company_id = current_user.company_id
 
-    # Get all units for the company, filtered by building if specified
-    if building == 'all':
-        units = Unit.query.filter_by(company_id=company_id).all()
-    else:
-        units = Unit.query.filter_by(company_id=company_id, building=building).all()
-
-    # Format unit data for the response
-    units_data = [{'id': unit.id, 'unit_number': unit.unit_number, 'building': unit.building} for unit in units]
-
-    # Get expense data for all months in the specified year
+    # One query for all units and their expense rows of the year; units
+    # without data still come back once thanks to the outer join
+    query = db.session.query(
+        Unit.id,
+        Unit.unit_number,
+        Unit.building,
+        ExpenseData.month,
+        *[getattr(ExpenseData, field) for field in EXPENSE_FIELDS]
+    ).outerjoin(
+        ExpenseData,
+        and_(ExpenseData.unit_id == Unit.id,
+             ExpenseData.company_id == company_id,
+             ExpenseData.year == year)
+    ).filter(Unit.company_id == company_id)
+
+    # Filter by building if specified
+    if building != 'all':
+        query = query.filter(Unit.building == building)
+
+    # Pivot the rows into unit -> month -> expenses, with empty values for missing months
+    units_data = []
     yearly_expenses = {}
+    for row in query.order_by(Unit.id, ExpenseData.month):
+        if row.id not in yearly_expenses:
+            units_data.append({'id': row.id, 'unit_number': row.unit_number, 'building': row.building})
+            yearly_expenses[row.id] = {month: dict.fromkeys(EXPENSE_FIELDS, 0) for month in range(1, 13)}
 
-    # For each unit
-    for unit in units:
-        unit_id = unit.id
-        yearly_expenses[unit_id] = {}
-
-        # For each month
-        for month in range(1, 13):
-            # Check if we have data for this month
-            expense_data = ExpenseData.query.filter_by(
-                company_id=company_id,
-                unit_id=unit_id,
-                year=year,
-                month=month
-            ).first()
-
-            if expense_data:
-                # If we have data, format it
-                yearly_expenses[unit_id][month] = {
-                    'sales': float(expense_data.sales or 0),
-                    'rental': float(expense_data.rental or 0),
-                    'electricity': float(expense_data.electricity or 0),
-                    'water': float(expense_data.water or 0),
-                    'sewage': float(expense_data.sewage or 0),
-                    'internet': float(expense_data.internet or 0),
-                    'cleaner': float(expense_data.cleaner or 0),
-                    'laundry': float(expense_data.laundry or 0),
-                    'supplies': float(expense_data.supplies or 0),
-                    'repair': float(expense_data.repair or 0),
-                    'replace': float(expense_data.replace or 0),
-                    'other': float(expense_data.other or 0)
-                }
-            else:
-                # If we don't have data, use empty values
-                yearly_expenses[unit_id][month] = {
-                    'sales': 0,
-                    'rental': 0,
-                    'electricity': 0,
-                    'water': 0,
-                    'sewage': 0,
-                    'internet': 0,
-                    'cleaner': 0,
-                    'laundry': 0,
-                    'supplies': 0,
-                    'repair': 0,
-                    'replace': 0,
-                    'other': 0
-                }
+        if row.month in yearly_expenses[row.id]:
+            yearly_expenses[row.id][row.month] = {field: float(getattr(row, field) or 0) for field in EXPENSE_FIELDS}
 
     return jsonify({
         'units': units_data,
-        'expenses': yearly_expenses
+        'expenses': yearly_expenses,
+        'totals': get_expense_totals(company_id, year, building=building)
     })
 
 
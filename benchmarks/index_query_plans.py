@@ -0,0 +1,175 @@
+"""
+Benchmark the composite indexes declared in models.py.
+
+Seeds a database with bookings (100k by default), then runs the hot booking
+queries with and without the ix_* indexes and prints each query plan and the
+median run time. Works against SQLite (default, a throwaway file) and
+PostgreSQL:
+
+    python benchmarks/index_query_plans.py
+    python benchmarks/index_query_plans.py --database-url postgresql://localhost/bench
+
+WARNING: all tables in the target database are dropped and recreated.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sqlalchemy import create_engine, insert, text  # noqa: E402
+from models import db  # noqa: E402
+
+TODAY = date(2025, 6, 15)
+
+# (label, SQL, parameters) for the queries the indexes are meant to serve
+QUERIES = [
+    ('booking stat cards', """
+        SELECT count(*), sum(CASE WHEN check_in_date = :today THEN price ELSE 0 END)
+        FROM booking_form
+        WHERE company_id = :company_id AND check_in_date <= :tomorrow AND check_out_date >= :today
+     """, {'company_id': 3, 'today': TODAY, 'tomorrow': TODAY + timedelta(days=1)}),
+    ('check-outs tomorrow', """
+        SELECT id FROM booking_form WHERE company_id = :company_id AND check_out_date = :tomorrow
+     """, {'company_id': 3, 'tomorrow': TODAY + timedelta(days=1)}),
+    ('unit availability', """
+        SELECT id FROM booking_form
+        WHERE unit_id = :unit_id AND check_in_date < :check_out AND check_out_date > :check_in
+     """, {'unit_id': 42, 'check_in': TODAY, 'check_out': TODAY + timedelta(days=3)}),
+    ('ICS sync existing bookings', """
+        SELECT id, confirmation_code FROM booking_form WHERE unit_id = :unit_id AND booking_source = :source
+     """, {'unit_id': 42, 'source': 'Airbnb'}),
+    ('bookings list first page', """
+        SELECT id FROM booking_form WHERE company_id = :company_id ORDER BY date_added DESC LIMIT 50
+     """, {'company_id': 3}),
+    ('CSV import code lookup', """
+        SELECT id FROM booking_form WHERE company_id = :company_id AND confirmation_code IN (:c1, :c2, :c3)
+     """, {'company_id': 3, 'c1': 'HM0000100', 'c2': 'HM0050000', 'c3': 'HM0099999'}),
+]
+
+
+def seed(engine, bookings, companies, units_per_company):
+    """Create all tables and fill them with synthetic bookings"""
+    db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+    tables = db.metadata.tables
+    rng = random.Random(42)
+
+    with engine.begin() as conn:
+        conn.execute(insert(tables['account_type']), [{'id': 1, 'name': 'Bench', 'max_units': 10000}])
+        conn.execute(insert(tables['role']), [{'id': 1, 'name': 'Manager'}])
+        conn.execute(insert(tables['company']), [
+            {'id': c, 'name': f'Company {c}', 'account_type_id': 1} for c in range(1, companies + 1)
+        ])
+        conn.execute(insert(tables['user']), [
+            {'id': c, 'name': f'User {c}', 'email': f'user{c}@example.com', 'password': '-',
+             'account_type_id': 1, 'company_id': c, 'role_id': 1} for c in range(1, companies + 1)
+        ])
+
+        units = []
+        for c in range(1, companies + 1):
+            for u in range(units_per_company):
+                units.append({'id': len(units) + 1, 'unit_number': f'U-{u}', 'building': f'Block {u % 5}',
+                              'company_id': c})
+        conn.execute(insert(tables['unit']), units)
+
+        batch = []
+        for i in range(bookings):
+            unit = rng.choice(units)
+            check_in = TODAY + timedelta(days=rng.randint(-900, 180))
+            nights = rng.randint(1, 7)
+            batch.append({
+                'guest_name': f'Guest {i}', 'contact_number': '-', 'check_in_date': check_in,
+                'check_out_date': check_in + timedelta(days=nights), 'property_name': unit['building'],
+                'unit_id': unit['id'], 'number_of_nights': nights, 'number_of_guests': 2,
+                'price': rng.randint(100, 600), 'booking_source': rng.choice(['Airbnb', 'Booking.com', 'WhatsApp']),
+                'payment_status': 'Pending', 'confirmation_code': f'HM{i:07d}',
+                'company_id': unit['company_id'], 'user_id': unit['company_id'],
+                'date_added': datetime.combine(check_in, datetime.min.time()) - timedelta(days=rng.randint(1, 60))
+            })
+            if len(batch) == 5000:
+                conn.execute(insert(tables['booking_form']), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(tables['booking_form']), batch)
+
+
+def benchmark_indexes():
+    """The ix_* indexes declared on the models"""
+    return [index for table in db.metadata.tables.values() for index in table.indexes
+            if index.name.startswith('ix_')]
+
+
+def explain(conn, sql, params):
+    prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+    rows = conn.execute(text(prefix + sql), params).fetchall()
+    # SQLite returns (id, parent, notused, detail); PostgreSQL a single text column
+    return [row[-1] for row in rows]
+
+
+def time_query(conn, sql, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(text(sql), params).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def run_queries(engine, repeat):
+    results = {}
+    with engine.connect() as conn:
+        if conn.dialect.name == 'sqlite':
+            conn.execute(text('ANALYZE'))
+        else:
+            conn.execute(text('ANALYZE booking_form'))
+        for label, sql, params in QUERIES:
+            results[label] = (explain(conn, sql, params), time_query(conn, sql, params, repeat))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='Target database (default: a temporary SQLite file)')
+    parser.add_argument('--bookings', type=int, default=100000)
+    parser.add_argument('--companies', type=int, default=20)
+    parser.add_argument('--units-per-company', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if not database_url:
+        database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'index_bench.db')
+    engine = create_engine(database_url)
+
+    print(f"Seeding {args.bookings} bookings into {engine.url.render_as_string(hide_password=True)} ...")
+    seed(engine, args.bookings, args.companies, args.units_per_company)
+
+    indexes = benchmark_indexes()
+    for index in indexes:
+        index.drop(engine, checkfirst=True)
+    without_indexes = run_queries(engine, args.repeat)
+
+    for index in indexes:
+        index.create(engine, checkfirst=True)
+    with_indexes = run_queries(engine, args.repeat)
+
+    for label, _, _ in QUERIES:
+        before_plan, before_ms = without_indexes[label]
+        after_plan, after_ms = with_indexes[label]
+        print(f"\n== {label}: {before_ms:.2f} ms -> {after_ms:.2f} ms")
+        print("  without indexes:")
+        for line in before_plan:
+            print(f"    {line}")
+        print("  with indexes:")
+        for line in after_plan:
+            print(f"    {line}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Add composite indexes for company/date and unit scoped queries
+
+Revision ID: 3f9c2a1b7d4e
+Revises:
+Create Date: 2026-10-18 09:12:41.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2a1b7d4e'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, columns) - kept in sync with __table_args__ in models.py.
+# Tables are created by db.create_all() on startup, which also creates these
+# indexes on a fresh database, so every operation is guarded with if_exists.
+INDEXES = [
+    ('ix_unit_company_building', 'unit', ['company_id', 'building']),
+    ('ix_complaint_company_date_added', 'complaint', ['company_id', 'date_added']),
+    ('ix_issue_company_date_added', 'issue', ['company_id', 'date_added']),
+    ('ix_issue_unit_date_added', 'issue', ['unit_id', 'date_added']),
+    ('ix_repair_company_created_at', 'repair', ['company_id', 'created_at']),
+    ('ix_replacement_company_date_requested', 'replacement', ['company_id', 'date_requested']),
+    ('ix_booking_form_company_check_in', 'booking_form', ['company_id', 'check_in_date']),
+    ('ix_booking_form_company_check_out', 'booking_form', ['company_id', 'check_out_date']),
+    ('ix_booking_form_company_date_added', 'booking_form', ['company_id', 'date_added']),
+    ('ix_booking_form_unit_check_in', 'booking_form', ['unit_id', 'check_in_date', 'check_out_date']),
+    ('ix_booking_form_unit_source', 'booking_form', ['unit_id', 'booking_source']),
+    ('ix_booking_form_company_confirmation', 'booking_form', ['company_id', 'confirmation_code']),
+    ('ix_calendar_source_unit_source', 'calendar_source', ['unit_id', 'source_name']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
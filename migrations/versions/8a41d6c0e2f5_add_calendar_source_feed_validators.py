@@ -0,0 +1,41 @@
+"""Add ETag, Last-Modified and content hash to calendar sources
+
+Revision ID: 8a41d6c0e2f5
+Revises: 3f9c2a1b7d4e
+Create Date: 2026-10-18 11:03:27.518630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a41d6c0e2f5'
+down_revision = '3f9c2a1b7d4e'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = [
+    ('etag', sa.String(length=255)),
+    ('last_modified', sa.String(length=100)),
+    ('content_hash', sa.String(length=64)),
+]
+
+
+def upgrade():
+    # db.create_all() on startup may already have added the columns
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('calendar_source')}
+    missing = [(name, type_) for name, type_ in COLUMNS if name not in existing]
+    if not missing:
+        return
+    with op.batch_alter_table('calendar_source', schema=None) as batch_op:
+        for name, type_ in missing:
+            batch_op.add_column(sa.Column(name, type_, nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('calendar_source', schema=None) as batch_op:
+        batch_op.drop_column('content_hash')
+        batch_op.drop_column('last_modified')
+        batch_op.drop_column('etag')
@@ -0,0 +1,82 @@
+"""Store expense amounts as Numeric(10, 2)
+
+Revision ID: c5d2e7f19a3b
+Revises: 8a41d6c0e2f5
+Create Date: 2026-10-18 14:26:09.731842
+
+"""
+from decimal import Decimal, InvalidOperation
+
+from alembic import op
+import sqlalchemy as sa
+
+from models import amount_in_range
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d2e7f19a3b'
+down_revision = '8a41d6c0e2f5'
+branch_labels = None
+depends_on = None
+
+
+FIELDS = ['sales', 'rental', 'electricity', 'water', 'sewage', 'internet', 'cleaner', 'laundry', 'supplies',
+          'repair', 'replace', 'other']
+
+
+def clean_amount(value):
+    """Amount of a stored string like "RM 1,234.5" as a two-decimal string, or None"""
+    if value is None:
+        return None
+    text = str(value).upper().replace('RM', '').replace(',', '').strip()
+    if not text:
+        return None
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        return None
+    if not amount_in_range(amount):
+        return None
+    return str(amount.quantize(Decimal('0.01')))
+
+
+def upgrade():
+    # Backfill: rewrite every stored string as a plain number (or NULL when it
+    # isn't one) so the type change below can cast it on any database
+    expense_data = sa.table('expense_data', sa.column('id', sa.Integer),
+                            *[sa.column(field, sa.String) for field in FIELDS])
+    bind = op.get_bind()
+
+    updates = []
+    for row in bind.execute(sa.select(expense_data)):
+        cleaned = {field: clean_amount(getattr(row, field)) for field in FIELDS}
+        if any(cleaned[field] != getattr(row, field) for field in FIELDS):
+            updates.append({'row_id': row.id, **cleaned})
+            dropped = [field for field in FIELDS if getattr(row, field) not in (None, '') and cleaned[field] is None]
+            if dropped:
+                print(f"expense_data {row.id}: cleared non-numeric {', '.join(dropped)}")
+
+    if updates:
+        bind.execute(
+            expense_data.update().where(expense_data.c.id == sa.bindparam('row_id'))
+            .values({field: sa.bindparam(field) for field in FIELDS}),
+            updates
+        )
+
+    with op.batch_alter_table('expense_data', schema=None) as batch_op:
+        for field in FIELDS:
+            batch_op.alter_column(field,
+                                  existing_type=sa.String(length=50),
+                                  type_=sa.Numeric(precision=10, scale=2),
+                                  existing_nullable=True,
+                                  postgresql_using=f'"{field}"::numeric(10, 2)')
+
+
+def downgrade():
+    with op.batch_alter_table('expense_data', schema=None) as batch_op:
+        for field in FIELDS:
+            batch_op.alter_column(field,
+                                  existing_type=sa.Numeric(precision=10, scale=2),
+                                  type_=sa.String(length=50),
+                                  existing_nullable=True,
+                                  postgresql_using=f'"{field}"::text')
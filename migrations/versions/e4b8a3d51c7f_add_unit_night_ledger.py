@@ -0,0 +1,102 @@
+"""Add the unit_night occupancy ledger
+
+Revision ID: e4b8a3d51c7f
+Revises: c5d2e7f19a3b
+Create Date: 2026-10-18 16:02:37.519204
+
+"""
+from datetime import timedelta
+from decimal import Decimal, ROUND_DOWN
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b8a3d51c7f'
+down_revision = 'c5d2e7f19a3b'
+branch_labels = None
+depends_on = None
+
+
+# Kept in sync with UnitNight.__table_args__ in models.py
+INDEXES = [
+    ('ix_unit_night_company_night', ['company_id', 'night']),
+    ('ix_unit_night_unit_night', ['unit_id', 'night']),
+]
+
+# Bookings backfilled per statement
+BATCH_SIZE = 500
+
+
+def unit_night_rows(booking):
+    """Ledger rows of a booking, split the same way as unit_night_rows() in app.py"""
+    nights = (booking.check_out_date - booking.check_in_date).days
+    if nights <= 0:
+        return []
+    price = Decimal(str(booking.price or 0))
+    rate = (price / nights).quantize(Decimal('0.0001'), rounding=ROUND_DOWN)
+    rows = [{
+        'booking_id': booking.id,
+        'unit_id': booking.unit_id,
+        'company_id': booking.company_id,
+        'night': booking.check_in_date + timedelta(days=index),
+        'revenue': rate
+    } for index in range(nights)]
+    rows[-1]['revenue'] = price - rate * (nights - 1)
+    return rows
+
+
+def backfill(bind):
+    """Add the ledger rows of every booking that has none yet, one batch at a time"""
+    booking_form = sa.table('booking_form', sa.column('id', sa.Integer), sa.column('unit_id', sa.Integer),
+                            sa.column('company_id', sa.Integer), sa.column('check_in_date', sa.Date),
+                            sa.column('check_out_date', sa.Date), sa.column('price', sa.Numeric(10, 2)))
+    unit_night = sa.table('unit_night', sa.column('booking_id', sa.Integer), sa.column('unit_id', sa.Integer),
+                          sa.column('company_id', sa.Integer), sa.column('night', sa.Date),
+                          sa.column('revenue', sa.Numeric(12, 4)))
+    # Bookings written by the app since the table was created already have rows
+    in_ledger = sa.select(unit_night.c.booking_id)
+
+    last_id = 0
+    while True:
+        bookings = bind.execute(
+            sa.select(booking_form).where(
+                booking_form.c.id > last_id,
+                booking_form.c.id.not_in(in_ledger)
+            ).order_by(booking_form.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not bookings:
+            break
+        rows = [row for booking in bookings for row in unit_night_rows(booking)]
+        if rows:
+            bind.execute(unit_night.insert(), rows)
+        last_id = bookings[-1].id
+
+
+def upgrade():
+    # db.create_all() on startup may already have created the table, holding
+    # only bookings written since. `flask rebuild-unit-nights` refills the ledger.
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table('unit_night'):
+        op.create_table('unit_night',
+                        sa.Column('id', sa.Integer(), nullable=False),
+                        sa.Column('booking_id', sa.Integer(), nullable=False),
+                        sa.Column('unit_id', sa.Integer(), nullable=False),
+                        sa.Column('company_id', sa.Integer(), nullable=False),
+                        sa.Column('night', sa.Date(), nullable=False),
+                        sa.Column('revenue', sa.Numeric(precision=12, scale=4), nullable=False),
+                        sa.ForeignKeyConstraint(['booking_id'], ['booking_form.id'], ondelete='CASCADE'),
+                        sa.ForeignKeyConstraint(['company_id'], ['company.id']),
+                        sa.ForeignKeyConstraint(['unit_id'], ['unit.id']),
+                        sa.PrimaryKeyConstraint('id'),
+                        sa.UniqueConstraint('booking_id', 'night', name='unique_unit_night_booking'))
+    for name, columns in INDEXES:
+        op.create_index(name, 'unit_night', columns, unique=False, if_not_exists=True)
+    backfill(bind)
+
+
+def downgrade():
+    for name, columns in reversed(INDEXES):
+        op.drop_index(name, table_name='unit_night', if_exists=True)
+    op.drop_table('unit_night')
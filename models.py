@@ -1,9 +1,18 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
+from decimal import Decimal
 
 db = SQLAlchemy()
 
+# Largest magnitude a Numeric(10, 2) amount column (prices, expenses) can hold
+MAX_AMOUNT = Decimal('99999999.99')
+
+
+def amount_in_range(amount):
+    """Whether a Decimal amount fits a Numeric(10, 2) column"""
+    return amount.is_finite() and abs(amount) <= MAX_AMOUNT
+
 
 # AccountType model
 class AccountType(db.Model):
@@ -130,7 +139,10 @@ class Unit(db.Model):
     replacements = db.relationship('Replacement', backref='unit_details', lazy=True)
 
     # Add a composite unique constraint for unit_number and company_id
-    __table_args__ = (db.UniqueConstraint('unit_number', 'company_id', name='_unit_company_uc'),)
+    __table_args__ = (
+        db.UniqueConstraint('unit_number', 'company_id', name='_unit_company_uc'),
+        db.Index('ix_unit_company_building', 'company_id', 'building'),
+    )
 
     def __repr__(self):
         return f"Unit('{self.unit_number}', Building: '{self.building}')"
@@ -189,6 +201,10 @@ class Complaint(db.Model):
 
     company = db.relationship('Company', backref='complaints')
 
+    __table_args__ = (
+        db.Index('ix_complaint_company_date_added', 'company_id', 'date_added'),
+    )
+
     def __repr__(self):
         return f"Complaint('{self.item}', '{self.unit}')"
 
@@ -237,6 +253,12 @@ class Issue(db.Model):
     issue_item = db.relationship('IssueItem', backref='issues')  # New relationship
     company = db.relationship('Company', backref='issues')
 
+    # Indexes for the company/date scoped listings and reports
+    __table_args__ = (
+        db.Index('ix_issue_company_date_added', 'company_id', 'date_added'),
+        db.Index('ix_issue_unit_date_added', 'unit_id', 'date_added'),
+    )
+
     def __repr__(self):
         return f"Issue('{self.description}', '{self.unit}')"
 
@@ -254,6 +276,10 @@ class Repair(db.Model):
 
     company = db.relationship('Company', backref='repairs')
 
+    __table_args__ = (
+        db.Index('ix_repair_company_created_at', 'company_id', 'created_at'),
+    )
+
     def __repr__(self):
         return f"Repair('{self.item}', '{self.unit}', '{self.status}')"
 
@@ -271,6 +297,10 @@ class Replacement(db.Model):
 
     company = db.relationship('Company', backref='replacements')
 
+    __table_args__ = (
+        db.Index('ix_replacement_company_date_requested', 'company_id', 'date_requested'),
+    )
+
     def __repr__(self):
         return f"Replacement('{self.item}', '{self.unit}', '{self.status}')"
 
@@ -304,10 +334,44 @@ class BookingForm(db.Model):
     author = db.relationship('User', backref='bookings')
     date_added = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
+    # Indexes matching the booking access patterns: stat cards and reports
+    # (company + date), availability checks (unit + date range), ICS sync
+    # (unit + source) and CSV import (company + confirmation code)
+    __table_args__ = (
+        db.Index('ix_booking_form_company_check_in', 'company_id', 'check_in_date'),
+        db.Index('ix_booking_form_company_check_out', 'company_id', 'check_out_date'),
+        db.Index('ix_booking_form_company_date_added', 'company_id', 'date_added'),
+        db.Index('ix_booking_form_unit_check_in', 'unit_id', 'check_in_date', 'check_out_date'),
+        db.Index('ix_booking_form_unit_source', 'unit_id', 'booking_source'),
+        db.Index('ix_booking_form_company_confirmation', 'company_id', 'confirmation_code'),
+    )
+
     def __repr__(self):
         return f"Booking('{self.guest_name}', '{self.unit.unit_number}', Check-in: '{self.check_in_date}')"
 
 
+# Derived ledger of booked nights: one row per booking per night with the
+# booking price spread over its nights. Maintained from app.py whenever bookings
+# change, so occupancy, ADR and RevPAR are plain SUMs over (company, night).
+class UnitNight(db.Model):
+    __tablename__ = 'unit_night'
+    id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking_form.id', ondelete='CASCADE'), nullable=False)
+    unit_id = db.Column(db.Integer, db.ForeignKey('unit.id'), nullable=False)
+    company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False)
+    night = db.Column(db.Date, nullable=False)
+    revenue = db.Column(db.Numeric(12, 4), nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('booking_id', 'night', name='unique_unit_night_booking'),
+        db.Index('ix_unit_night_company_night', 'company_id', 'night'),
+        db.Index('ix_unit_night_unit_night', 'unit_id', 'night'),
+    )
+
+    def __repr__(self):
+        return f"UnitNight(Unit: {self.unit_id}, {self.night})"
+
+
     # Add this to your model.py to track imported calendars
 class CalendarSource(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -316,8 +380,17 @@ class CalendarSource(db.Model):
     source_url = db.Column(db.String(1000), nullable=True)  # URL if imported from URL
     last_updated = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
+    # Validators from the last processed download, used to skip unchanged feeds
+    etag = db.Column(db.String(255), nullable=True)
+    last_modified = db.Column(db.String(100), nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True)  # SHA-256 of the feed body
+
     unit = db.relationship('Unit', backref='calendar_sources')
 
+    __table_args__ = (
+        db.Index('ix_calendar_source_unit_source', 'unit_id', 'source_name'),
+    )
+
     def __repr__(self):
         return f"CalendarSource('{self.source_name}', '{self.unit.unit_number}')"
 
@@ -350,20 +423,20 @@ class ExpenseData(db.Model):
     month = db.Column(db.Integer, nullable=False)
 
     # Revenue
-    sales = db.Column(db.String(50), nullable=True)
+    sales = db.Column(db.Numeric(10, 2), nullable=True)
 
     # Expenses
-    rental = db.Column(db.String(50), nullable=True)
-    electricity = db.Column(db.String(50), nullable=True)
-    water = db.Column(db.String(50), nullable=True)
-    sewage = db.Column(db.String(50), nullable=True)
-    internet = db.Column(db.String(50), nullable=True)
-    cleaner = db.Column(db.String(50), nullable=True)
-    laundry = db.Column(db.String(50), nullable=True)
-    supplies = db.Column(db.String(50), nullable=True)
-    repair = db.Column(db.String(50), nullable=True)
-    replace = db.Column(db.String(50), nullable=True)
-    other = db.Column(db.String(50), nullable=True)
+    rental = db.Column(db.Numeric(10, 2), nullable=True)
+    electricity = db.Column(db.Numeric(10, 2), nullable=True)
+    water = db.Column(db.Numeric(10, 2), nullable=True)
+    sewage = db.Column(db.Numeric(10, 2), nullable=True)
+    internet = db.Column(db.Numeric(10, 2), nullable=True)
+    cleaner = db.Column(db.Numeric(10, 2), nullable=True)
+    laundry = db.Column(db.Numeric(10, 2), nullable=True)
+    supplies = db.Column(db.Numeric(10, 2), nullable=True)
+    repair = db.Column(db.Numeric(10, 2), nullable=True)
+    replace = db.Column(db.Numeric(10, 2), nullable=True)
+    other = db.Column(db.Numeric(10, 2), nullable=True)
 
     # Timestamps
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
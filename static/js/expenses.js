@@ -18,6 +18,7 @@ class ExpensesManager {
         // Data state
         this.currentUnits = [];
         this.currentExpenses = {};
+        this.currentMonthView = null;
 
         // Initialize
         this.init();
@@ -89,9 +90,9 @@ class ExpensesManager {
         // Get selected month-year
         const [year, month] = this.monthFilter.value.split('-');
 
-        // Make API request to get expense data
-        fetch(`/api/expenses?year=${year}&month=${month}`)
-            .then(response => response.json())
+        // Make API request to get expense data (always fresh, the ETag keeps unchanged months cheap)
+        this.currentMonthView = null;
+        this.getMonthView(year, month)
             .then(data => {
                 // Store data
                 this.currentUnits = data.units || [];
@@ -120,26 +121,42 @@ class ExpensesManager {
             .catch(error => {
                 console.error('Error loading expenses data:', error);
 
-                // If API fails, generate empty data for all units
-                fetch('/api/get_units')
-                    .then(response => response.json())
-                    .then(units => {
-                        this.currentUnits = units;
-                        this.currentExpenses = {};
-
-                        // Render empty table
-                        this.renderExpensesTable();
-
-                        // Apply any active filters
-                        this.filterUnits();
-
-                        this.showLoading(false);
-                    })
-                    .catch(err => {
-                        console.error('Failed to load units:', err);
-                        this.showLoading(false);
-                        this.showSaveMessage('Failed to load data. Please try again.', true);
-                    });
+                // Keep the units of the last month view loaded, with empty expenses
+                this.currentExpenses = {};
+
+                // Render empty table
+                this.renderExpensesTable();
+
+                // Apply any active filters
+                this.filterUnits();
+
+                this.showLoading(false);
+                this.showSaveMessage('Failed to load data. Please try again.', true);
+            });
+    }
+
+    /**
+     * Get the month view (units, expenses, booking revenue and issue costs) of a month,
+     * reusing the last one loaded if it is for the same month
+     * @param {string|number} year - The year to load data for
+     * @param {string|number} month - The month to load data for
+     */
+    getMonthView(year, month) {
+        const view = this.currentMonthView;
+        if (view && view.year == year && view.month == month) {
+            return Promise.resolve(view);
+        }
+
+        return fetch(`/api/expenses/month_view?year=${year}&month=${month}`)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error('Failed to load month data');
+                }
+                return response.json();
+            })
+            .then(data => {
+                this.currentMonthView = data;
+                return data;
             });
     }
 
@@ -429,18 +446,23 @@ class ExpensesManager {
         })
         .then(response => {
             if (!response.ok) {
-                throw new Error('Failed to save data');
+                // Validation errors come back as {error: message}
+                return response.json().catch(() => ({})).then(result => {
+                    throw new Error(result.error || 'Failed to save data');
+                });
             }
             return response.json();
         })
         .then(result => {
+            // The cached month view no longer matches what was saved
+            this.currentMonthView = null;
             this.showLoading(false);
             this.showSaveMessage('Data saved successfully');
         })
         .catch(error => {
             console.error('Error saving expenses data:', error);
             this.showLoading(false);
-            this.showSaveMessage('Failed to save data. Please try again.', true);
+            this.showSaveMessage(`Failed to save data: ${error.message}`, true);
         });
     }
 
@@ -560,9 +582,8 @@ class ExpensesManager {
     loadSalesFromBookings(year, month) {
         this.showLoading(true);
 
-        // Make API request to get booking data for sales calculations
-        fetch(`/api/bookings/monthly_revenue?year=${year}&month=${month}`)
-            .then(response => response.json())
+        // Booking revenue for sales comes with the month view
+        this.getMonthView(year, month)
             .then(data => {
                 // Loop through the units and update their sales values from bookings
                 for (const unitId in data.revenues) {
@@ -608,14 +629,13 @@ class ExpensesManager {
     loadRepairCostsFromIssues(year, month) {
         this.showLoading(true);
 
-        // Make API request to get issue costs for repair calculations
-        fetch(`/api/issues/monthly_costs?year=${year}&month=${month}&type=repair`)
-            .then(response => response.json())
+        // Repair costs from issues come with the month view
+        this.getMonthView(year, month)
             .then(data => {
                 // Loop through the units and update their repair values from issues
-                for (const unitId in data.costs) {
+                for (const unitId in data.repair_costs) {
                     if (this.currentExpenses[unitId]) {
-                        this.currentExpenses[unitId].repair = data.costs[unitId].toFixed(2);
+                        this.currentExpenses[unitId].repair = data.repair_costs[unitId].toFixed(2);
                     } else {
                         this.currentExpenses[unitId] = {
                             sales: '',
@@ -627,7 +647,7 @@ class ExpensesManager {
                             cleaner: '',
                             laundry: '',
                             supplies: '',
-                            repair: data.costs[unitId].toFixed(2),
+                            repair: data.repair_costs[unitId].toFixed(2),
                             replace: '',
                             other: ''
                         };
@@ -656,14 +676,13 @@ class ExpensesManager {
     loadReplaceCostsFromIssues(year, month) {
         this.showLoading(true);
 
-        // Make API request to get issue costs for replacement calculations
-        fetch(`/api/issues/monthly_costs?year=${year}&month=${month}&type=replace`)
-            .then(response => response.json())
+        // Replacement costs from issues come with the month view
+        this.getMonthView(year, month)
             .then(data => {
                 // Loop through the units and update their replace values from issues
-                for (const unitId in data.costs) {
+                for (const unitId in data.replace_costs) {
                     if (this.currentExpenses[unitId]) {
-                        this.currentExpenses[unitId].replace = data.costs[unitId].toFixed(2);
+                        this.currentExpenses[unitId].replace = data.replace_costs[unitId].toFixed(2);
                     } else {
                         this.currentExpenses[unitId] = {
                             sales: '',
@@ -676,7 +695,7 @@ class ExpensesManager {
                             laundry: '',
                             supplies: '',
                             repair: '',
-                            replace: data.costs[unitId].toFixed(2),
+                            replace: data.replace_costs[unitId].toFixed(2),
                             other: ''
                         };
                     }
@@ -697,6 +716,22 @@ class ExpensesManager {
     }
 }
 
+/**
+ * Month view of a month through the expenses sheet's cache, so the analysis
+ * and P&L tabs reuse the month the sheet loaded
+ */
+function loadMonthView(year, month) {
+    if (window.expensesManager) {
+        return window.expensesManager.getMonthView(year, month);
+    }
+    return fetch(`/api/expenses/month_view?year=${year}&month=${month}`).then(response => {
+        if (!response.ok) {
+            throw new Error('Failed to load month data');
+        }
+        return response.json();
+    });
+}
+
 // Initialize the expenses manager when the page loads
 document.addEventListener('DOMContentLoaded', function() {
     if (document.getElementById('expenses-table')) {
@@ -710,38 +745,10 @@ function initializeAnalysisTab() {
     const currentMonth = new Date().getMonth() + 1; // JavaScript months are 0-based
     document.getElementById('analysis-month').value = currentMonth;
 
-    // Populate units dropdown
-    populateAnalysisUnits();
-
     // Set up event listener for the Run Analysis button
     document.getElementById('run-analysis-btn').addEventListener('click', runExpenseAnalysis);
 }
 
-// Populate units dropdown for analysis tab
-function populateAnalysisUnits() {
-    fetch('/api/get_units')
-        .then(response => response.json())
-        .then(units => {
-            const unitSelect = document.getElementById('analysis-unit');
-
-            // Clear existing options except "All Units"
-            while (unitSelect.options.length > 1) {
-                unitSelect.remove(1);
-            }
-
-            // Add units to dropdown
-            units.forEach(unit => {
-                const option = document.createElement('option');
-                option.value = unit.id;
-                option.textContent = unit.unit_number;
-                unitSelect.appendChild(option);
-            });
-        })
-        .catch(error => {
-            console.error('Error loading units:', error);
-        });
-}
-
 // Run the expense analysis
 function runExpenseAnalysis() {
     const month = document.getElementById('analysis-month').value;
@@ -827,9 +834,6 @@ document.addEventListener('DOMContentLoaded', function() {
 
 // Initialize the Analysis tab
 function initializeAnalysisTab() {
-    // Populate the unit dropdown
-    populateAnalysisUnits();
-
     // Set current month
     const now = new Date();
     const currentMonthYear = `${now.getFullYear()}-${String(now.getMonth() + 1).padStart(2, '0')}`;
@@ -848,7 +852,13 @@ function initializeAnalysisTab() {
         }
     });
     document.getElementById('analysis-unit').addEventListener('change', updateAnalysis);
-    document.getElementById('refresh-analysis-btn').addEventListener('click', updateAnalysis);
+    document.getElementById('refresh-analysis-btn').addEventListener('click', function() {
+        // Refresh asks the server again instead of reusing the cached month view
+        if (window.expensesManager) {
+            window.expensesManager.currentMonthView = null;
+        }
+        updateAnalysis();
+    });
 
     // Initialize the pie chart
     initializeExpenseChart();
@@ -857,29 +867,28 @@ function initializeAnalysisTab() {
     updateAnalysis();
 }
 
-// Populate units dropdown for analysis
-function populateAnalysisUnits() {
-    fetch('/api/get_units')
-        .then(response => response.json())
-        .then(units => {
-            const unitSelect = document.getElementById('analysis-unit');
+// Populate units dropdown for analysis from the units of a month view
+function populateAnalysisUnits(units) {
+    const unitSelect = document.getElementById('analysis-unit');
+    const selected = unitSelect.value;
 
-            // Clear existing options except "All Units"
-            while (unitSelect.options.length > 1) {
-                unitSelect.remove(1);
-            }
+    // Clear existing options except "All Units"
+    while (unitSelect.options.length > 1) {
+        unitSelect.remove(1);
+    }
 
-            // Add units to dropdown
-            units.forEach(unit => {
-                const option = document.createElement('option');
-                option.value = unit.id;
-                option.textContent = unit.unit_number;
-                unitSelect.appendChild(option);
-            });
-        })
-        .catch(error => {
-            console.error('Error loading units:', error);
-        });
+    // Add units to dropdown
+    units.forEach(unit => {
+        const option = document.createElement('option');
+        option.value = unit.id;
+        option.textContent = unit.unit_number;
+        unitSelect.appendChild(option);
+    });
+
+    // Keep the selected unit if it is still listed
+    if (unitSelect.querySelector(`option[value="${selected}"]`)) {
+        unitSelect.value = selected;
+    }
 }
 
 // Chart instance
@@ -947,64 +956,39 @@ function updateAnalysis() {
     // Parse year and month
     const [year, month] = selectedMonthYear.split('-').map(Number);
 
-    // Calculate previous month
-    let prevYear = year;
-    let prevMonth = month - 1;
-
-    if (prevMonth === 0) {
-        prevMonth = 12;
-        prevYear--;
-    }
-
     // Show loading state
     document.querySelector('.analysis-content').classList.add('loading');
 
-    // Fetch data for current month
-    fetch(`/api/expenses?year=${year}&month=${month}`)
-        .then(response => response.json())
+    // Month view of the month (cached by the expenses sheet), including the previous month's expenses
+    loadMonthView(year, month)
         .then(currentData => {
-            // Process the current month expense data
-            const currentExpenseData = processExpenseData(currentData, selectedUnit);
+            populateAnalysisUnits(currentData.units || []);
 
-            // Now fetch previous month's data
-            fetch(`/api/expenses?year=${prevYear}&month=${prevMonth}`)
-                .then(response => response.json())
-                .then(prevData => {
-                    // Process the previous month expense data
-                    const prevExpenseData = processExpenseData(prevData, selectedUnit);
+            // Process the current and previous month expense data
+            const currentExpenseData = processExpenseData(currentData, selectedUnit);
+            const prevExpenseData = processExpenseData(
+                { units: currentData.units, expenses: currentData.previous_expenses },
+                selectedUnit
+            );
 
-                    // Calculate percentage change
-                    const percentChange = calculatePercentChange(
-                        prevExpenseData.total,
-                        currentExpenseData.total
-                    );
+            // Calculate percentage change
+            const percentChange = calculatePercentChange(
+                prevExpenseData.total,
+                currentExpenseData.total
+            );
 
-                    // Update the UI with the data
-                    updateExpenseDisplay(currentExpenseData, percentChange);
+            // Update the UI with the data
+            updateExpenseDisplay(currentExpenseData, percentChange);
 
-                    // Hide loading state
-                    document.querySelector('.analysis-content').classList.remove('loading');
+            // Hide loading state
+            document.querySelector('.analysis-content').classList.remove('loading');
 
-                    // Fetch and display top units if needed
-                    if (selectedUnit === 'all') {
-                        fetchTopExpenseUnits(year, month);
-                    } else {
-                        document.querySelector('.top-units-section').style.display = 'none';
-                    }
-                })
-                .catch(error => {
-                    console.error('Error fetching previous month data:', error);
-                    // Still update the UI with current month data
-                    updateExpenseDisplay(currentExpenseData);
-                    document.querySelector('.analysis-content').classList.remove('loading');
-
-                    // Fetch and display top units if needed
-                    if (selectedUnit === 'all') {
-                        fetchTopExpenseUnits(year, month);
-                    } else {
-                        document.querySelector('.top-units-section').style.display = 'none';
-                    }
-                });
+            // Fetch and display top units if needed
+            if (selectedUnit === 'all') {
+                showTopExpenseUnits(currentData);
+            } else {
+                document.querySelector('.top-units-section').style.display = 'none';
+            }
         })
         .catch(error => {
             console.error('Error fetching current month data:', error);
@@ -1223,22 +1207,13 @@ document.addEventListener('DOMContentLoaded', function() {
     initializeAnalysisTab();
 });
 
-// Function to fetch top expense units
-function fetchTopExpenseUnits(year, month) {
+// Function to show the top expense units of a loaded month view
+function showTopExpenseUnits(data) {
     // Show the top units section
     document.querySelector('.top-units-section').style.display = 'block';
 
-    fetch(`/api/expenses?year=${year}&month=${month}`)
-        .then(response => response.json())
-        .then(data => {
-            const topUnits = calculateTopExpenseUnits(data);
-            renderTopUnitsChart(topUnits);
-        })
-        .catch(error => {
-            console.error('Error fetching top units data:', error);
-            document.querySelector('.top-units-chart-container').innerHTML =
-                '<p class="error-message">Failed to load top units data. Please try again.</p>';
-        });
+    const topUnits = calculateTopExpenseUnits(data);
+    renderTopUnitsChart(topUnits);
 }
 
 // Function to calculate top expense units
@@ -1417,9 +1392,8 @@ function updatePnLStatement() {
             `${monthNames[month-1]} ${year} | All Units`;
     }
 
-    // Fetch data for current month
-    fetch(`/api/expenses?year=${year}&month=${month}`)
-        .then(response => response.json())
+    // Month view of the month (cached by the expenses sheet), including the previous month's expenses
+    loadMonthView(year, month)
         .then(currentData => {
             // Get all units
             const units = currentData.units || [];
@@ -1473,88 +1447,66 @@ function updatePnLStatement() {
                                  totalRepair + totalReplace + totalOther;
             const netIncome = totalRevenue - totalExpenses;
 
-            // Now fetch previous month data for comparison
-            fetch(`/api/expenses?year=${prevYear}&month=${prevMonth}`)
-                .then(response => response.json())
-                .then(prevData => {
-                    // Calculate previous month totals
-                    let prevTotalSales = 0;
-                    let prevTotalExpenses = 0;
-
-                    const prevUnits = prevData.units || [];
-                    const prevExpensesData = prevData.expenses || {};
-
-                    // Filter previous month units if a specific unit is selected
-                    const filteredPrevUnits = selectedUnit === 'all' ?
-                        prevUnits :
-                        prevUnits.filter(unit => unit.id == selectedUnit);
-
-                    // Process each unit's data for previous month
-                    filteredPrevUnits.forEach(unit => {
-                        const unitId = unit.id;
-                        const unitExpenses = prevExpensesData[unitId] || {};
-
-                        // Sum up sales
-                        prevTotalSales += parseFloat(unitExpenses.sales || 0);
-
-                        // Sum up all expenses
-                        prevTotalExpenses += parseFloat(unitExpenses.rental || 0);
-                        prevTotalExpenses += parseFloat(unitExpenses.electricity || 0);
-                        prevTotalExpenses += parseFloat(unitExpenses.water || 0);
-                        prevTotalExpenses += parseFloat(unitExpenses.sewage || 0);
-                        prevTotalExpenses += parseFloat(unitExpenses.internet || 0);
-                        prevTotalExpenses += parseFloat(unitExpenses.cleaner || 0);
-                        prevTotalExpenses += parseFloat(unitExpenses.laundry || 0);
-                        prevTotalExpenses += parseFloat(unitExpenses.supplies || 0);
-                        prevTotalExpenses += parseFloat(unitExpenses.repair || 0);
-                        prevTotalExpenses += parseFloat(unitExpenses.replace || 0);
-                        prevTotalExpenses += parseFloat(unitExpenses.other || 0);
-                    });
-
-                    const prevNetIncome = prevTotalSales - prevTotalExpenses;
-
-                    // Calculate percentage changes
-                    const revenueChange = prevTotalSales === 0 ? 0 : ((totalRevenue - prevTotalSales) / prevTotalSales) * 100;
-                    const expensesChange = prevTotalExpenses === 0 ? 0 : ((totalExpenses - prevTotalExpenses) / prevTotalExpenses) * 100;
-                    const incomeChange = prevNetIncome === 0 ? 0 : ((netIncome - prevNetIncome) / prevNetIncome) * 100;
-
-                    // Update summary cards
-                    document.getElementById('pl-total-revenue').textContent = formatNumber(totalRevenue);
-                    document.getElementById('pl-revenue-change').textContent = revenueChange.toFixed(1);
-                    document.getElementById('pl-revenue-prev-month').textContent = prevMonthName;
-
-                    document.getElementById('pl-total-expenses').textContent = formatNumber(totalExpenses);
-                    document.getElementById('pl-expenses-change').textContent = (expensesChange >= 0 ? '+' + expensesChange.toFixed(1) : expensesChange.toFixed(1));
-
-                    document.getElementById('pl-expenses-prev-month').textContent = prevMonthName;
-
-                    document.getElementById('pl-net-income').textContent = formatNumber(netIncome);
-                    document.getElementById('pl-income-change').textContent = (incomeChange >= 0 ? '+' + incomeChange.toFixed(1) : incomeChange.toFixed(1));
-
-                    document.getElementById('pl-income-prev-month').textContent = prevMonthName;
-
-                    // Update table content
-                    updatePLTable(
-                        totalSales, totalRental, totalElectricity, totalWater, totalSewage,
-                        totalInternet, totalCleaner, totalLaundry, totalSupplies,
-                        totalRepair, totalReplace, totalOther,
-                        totalRevenue, totalExpenses
-                    );
+            // Previous month totals; its expenses came with the month view
+            let prevTotalSales = 0;
+            let prevTotalExpenses = 0;
 
-                    // Hide loading state
-                    document.querySelector('.pl-statement-content').classList.remove('loading');
-                })
-                .catch(error => {
-                    console.error('Error fetching previous month data:', error);
-                    // Still update with current month data
-                    updatePLTableWithoutComparison(
-                        totalSales, totalRental, totalElectricity, totalWater, totalSewage,
-                        totalInternet, totalCleaner, totalLaundry, totalSupplies,
-                        totalRepair, totalReplace, totalOther,
-                        totalRevenue, totalExpenses
-                    );
-                    document.querySelector('.pl-statement-content').classList.remove('loading');
-                });
+            const prevExpensesData = currentData.previous_expenses || {};
+
+            // Process each unit's data for previous month
+            filteredUnits.forEach(unit => {
+                const unitId = unit.id;
+                const unitExpenses = prevExpensesData[unitId] || {};
+
+                // Sum up sales
+                prevTotalSales += parseFloat(unitExpenses.sales || 0);
+
+                // Sum up all expenses
+                prevTotalExpenses += parseFloat(unitExpenses.rental || 0);
+                prevTotalExpenses += parseFloat(unitExpenses.electricity || 0);
+                prevTotalExpenses += parseFloat(unitExpenses.water || 0);
+                prevTotalExpenses += parseFloat(unitExpenses.sewage || 0);
+                prevTotalExpenses += parseFloat(unitExpenses.internet || 0);
+                prevTotalExpenses += parseFloat(unitExpenses.cleaner || 0);
+                prevTotalExpenses += parseFloat(unitExpenses.laundry || 0);
+                prevTotalExpenses += parseFloat(unitExpenses.supplies || 0);
+                prevTotalExpenses += parseFloat(unitExpenses.repair || 0);
+                prevTotalExpenses += parseFloat(unitExpenses.replace || 0);
+                prevTotalExpenses += parseFloat(unitExpenses.other || 0);
+            });
+
+            const prevNetIncome = prevTotalSales - prevTotalExpenses;
+
+            // Calculate percentage changes
+            const revenueChange = prevTotalSales === 0 ? 0 : ((totalRevenue - prevTotalSales) / prevTotalSales) * 100;
+            const expensesChange = prevTotalExpenses === 0 ? 0 : ((totalExpenses - prevTotalExpenses) / prevTotalExpenses) * 100;
+            const incomeChange = prevNetIncome === 0 ? 0 : ((netIncome - prevNetIncome) / prevNetIncome) * 100;
+
+            // Update summary cards
+            document.getElementById('pl-total-revenue').textContent = formatNumber(totalRevenue);
+            document.getElementById('pl-revenue-change').textContent = revenueChange.toFixed(1);
+            document.getElementById('pl-revenue-prev-month').textContent = prevMonthName;
+
+            document.getElementById('pl-total-expenses').textContent = formatNumber(totalExpenses);
+            document.getElementById('pl-expenses-change').textContent = (expensesChange >= 0 ? '+' + expensesChange.toFixed(1) : expensesChange.toFixed(1));
+
+            document.getElementById('pl-expenses-prev-month').textContent = prevMonthName;
+
+            document.getElementById('pl-net-income').textContent = formatNumber(netIncome);
+            document.getElementById('pl-income-change').textContent = (incomeChange >= 0 ? '+' + incomeChange.toFixed(1) : incomeChange.toFixed(1));
+
+            document.getElementById('pl-income-prev-month').textContent = prevMonthName;
+
+            // Update table content
+            updatePLTable(
+                totalSales, totalRental, totalElectricity, totalWater, totalSewage,
+                totalInternet, totalCleaner, totalLaundry, totalSupplies,
+                totalRepair, totalReplace, totalOther,
+                totalRevenue, totalExpenses
+            );
+
+            // Hide loading state
+            document.querySelector('.pl-statement-content').classList.remove('loading');
         })
         .catch(error => {
             console.error('Error fetching current month data:', error);
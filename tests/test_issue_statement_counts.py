@@ -0,0 +1,107 @@
+"""
+The issue views load their relations through the ISSUE_LOAD_PRESETS in app.py,
+so the number of SQL statements per request must not grow with the issues.
+"""
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# app.py creates its tables on import, keep them out of the real database
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'issue_statements.db')
+
+from app import app, bcrypt  # noqa: E402
+from models import db, User, Unit, Issue, Category, ReportedBy, Priority, Status, Type, IssueItem  # noqa: E402
+
+PASSWORD = 'statement-count'
+
+
+@pytest.fixture(scope='module')
+def accounts():
+    """(manager email, cleaner email) of the default company, with two units"""
+    app.config['TESTING'] = True
+    with app.app_context():
+        admin = User.query.filter_by(email='admin@example.com').first()
+        units = [Unit(unit_number=f'T-{index}', building='Block T', company_id=admin.company_id) for index in range(3)]
+        password = bcrypt.generate_password_hash(PASSWORD).decode('utf-8')
+        manager = User(name='Issue Manager', email='issues-manager@example.com', password=password,
+                       company_id=admin.company_id, role_id=admin.role_id)
+        cleaner = User(name='Issue Cleaner', email='issues-cleaner@example.com', password=password,
+                       company_id=admin.company_id, role_id=admin.role_id, is_cleaner=True)
+        cleaner.assigned_units = units[:2]
+        db.session.add_all(units + [manager, cleaner])
+        db.session.commit()
+        return manager.email, cleaner.email
+
+
+def seed_issues(count, rng):
+    """Add count issues with a unit, category, priority, status and item set"""
+    with app.app_context():
+        admin = User.query.filter_by(email='admin@example.com').first()
+        units = Unit.query.filter_by(company_id=admin.company_id).all()
+        lookups = {model: model.query.all() for model in (Category, ReportedBy, Priority, Status, Type, IssueItem)}
+        for _ in range(count):
+            unit = rng.choice(units)
+            db.session.add(Issue(
+                description='Statement count', user_id=admin.id, company_id=admin.company_id,
+                unit=unit.unit_number, unit_id=unit.id,
+                category_id=rng.choice(lookups[Category]).id,
+                reported_by_id=rng.choice(lookups[ReportedBy]).id,
+                priority_id=rng.choice(lookups[Priority]).id,
+                status_id=rng.choice(lookups[Status]).id,
+                type_id=rng.choice(lookups[Type]).id,
+                issue_item_id=rng.choice(lookups[IssueItem]).id,
+                cost=Decimal(rng.randint(0, 50000)) / 100,
+                date_added=datetime.utcnow() - timedelta(hours=rng.randint(0, 2000))
+            ))
+        db.session.commit()
+
+
+def logged_in_client(email):
+    client = app.test_client()
+    response = client.post('/login', data={'email': email, 'password': PASSWORD})
+    assert response.status_code == 302
+    return client
+
+
+def statement_count(client, url):
+    with app.app_context():
+        engine = db.engine
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    assert response.status_code == 200, url
+    return len(statements)
+
+
+def test_issue_views_statement_count_is_constant(accounts):
+    manager_email, cleaner_email = accounts
+    manager = logged_in_client(manager_email)
+    cleaner = logged_in_client(cleaner_email)
+    views = [(manager, '/issues'), (manager, '/api/analytics/issues'), (cleaner, '/cleaner_dashboard')]
+    rng = random.Random(19)
+
+    seed_issues(5, rng)
+    # First requests fill the user and lookup id caches
+    for client, url in views:
+        statement_count(client, url)
+    few = {url: statement_count(client, url) for client, url in views}
+
+    seed_issues(45, rng)
+    many = {url: statement_count(client, url) for client, url in views}
+
+    assert many == few